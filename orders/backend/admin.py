@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from .basket import refresh_order_totals
+from .caching import bump_catalog_version_on_commit
+from .catalog import refresh_catalog
 from .forms import CustomUserCreationForm, CustomUserChangeForm
 from .models import (
     CustomUser,
@@ -13,7 +16,11 @@ from .models import (
     Order,
     OrderItem,
     ContactInfo,
-    ConfirmEmailToken, AvatarUser, AvatarProduct,
+    ConfirmEmailToken,
+    AvatarUser,
+    AvatarProduct,
+    ImportSkip,
+    ImportJob,
 )
 
 # Register your models here.
@@ -99,6 +106,10 @@ class ShopAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {"fields": ("name", "status")}),
         ("Additional Info", {"fields": ("url", "user")}),
+        (
+            "Импорт прайса",
+            {"fields": ("feed_url", "feed_etag", "feed_last_modified", "feed_hash")},
+        ),
     )
     list_display = ("id", "name", "url", "status")
     search_fields = ["name"]
@@ -106,6 +117,31 @@ class ShopAdmin(admin.ModelAdmin):
     list_editable = ("status",)
 
 
+@admin.register(ImportSkip)
+class ImportSkipAdmin(admin.ModelAdmin):
+    list_display = ("id", "shop", "reason", "size", "created_at")
+    list_filter = ("reason", "created_at")
+    readonly_fields = ("created_at",)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "user",
+        "shop",
+        "state",
+        "goods_processed",
+        "inserted",
+        "updated",
+        "deleted",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("state", "created_at")
+    readonly_fields = ("created_at", "started_at", "finished_at")
+
+
 class ProductInline(admin.TabularInline):
     model = Product
     extra = 1
@@ -157,6 +193,22 @@ class ProductInfoAdmin(admin.ModelAdmin):
     )
     inlines = [ProductParameterInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Удаленные во вкладке параметры не вызывают сигналов
+        refresh_catalog([form.instance.id])
+        bump_catalog_version_on_commit(form.instance.shop_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_catalog_version_on_commit(obj.shop_id)
+
+    def delete_queryset(self, request, queryset):
+        shops = set(queryset.values_list("shop_id", flat=True))
+        super().delete_queryset(request, queryset)
+        for shop_id in shops:
+            bump_catalog_version_on_commit(shop_id)
+
 
 @admin.register(Parameter)
 class ParameterAdmin(admin.ModelAdmin):
@@ -171,28 +223,60 @@ class ParameterAdmin(admin.ModelAdmin):
 class ProductParameterAdmin(admin.ModelAdmin):
     list_display = ("id", "product_info", "parameter", "value")
 
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_catalog([obj.product_info_id])
+        bump_catalog_version_on_commit(obj.product_info.shop_id)
+
+    def delete_queryset(self, request, queryset):
+        rows = set(queryset.values_list("product_info_id", "product_info__shop_id"))
+        super().delete_queryset(request, queryset)
+        refresh_catalog([product_info_id for product_info_id, _ in rows])
+        for shop_id in {shop_id for _, shop_id in rows}:
+            bump_catalog_version_on_commit(shop_id)
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1
+    # Цена берется из прайса при сохранении позиции
+    readonly_fields = ("price",)
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     model = Order
-    fields = ("user", "status", "contact", "dt")
-    list_display = ("id", "user", "dt", "status", "contact")
+    fields = ("user", "status", "contact", "dt", "total_sum", "items_count")
+    list_display = ("id", "user", "dt", "status", "contact", "total_sum")
     search_fields = ["user__email"]
     list_filter = ("status",)
-    readonly_fields = ("dt",)
+    readonly_fields = ("dt", "total_sum", "items_count")
     inlines = [
         OrderItemInline,
     ]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_order_totals([form.instance.id])
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ("id", "order", "product_info", "quantity")
+    list_display = ("id", "order", "product_info", "quantity", "price")
+    readonly_fields = ("price",)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_order_totals([obj.order_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_order_totals([obj.order_id])
+
+    def delete_queryset(self, request, queryset):
+        order_ids = set(queryset.values_list("order_id", flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_order_totals(order_ids)
 
 
 @admin.register(ContactInfo)
@@ -10,3 +10,4 @@ class BackendConfig(AppConfig):
         """
         импортируем сигналы
         """
+        from . import signals  # noqa: F401
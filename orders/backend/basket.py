@@ -0,0 +1,479 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from ujson import loads as load_json
+
+from .caching import bump_catalog_version_on_commit
+from .catalog import refresh_catalog_entries
+from .models import Order, OrderItem, ProductInfo
+
+
+def basket_cache_key(user_id):
+    return f"basket:user:{user_id}"
+
+
+def basket_id(user_id, cached=True):
+    """
+    id корзины пользователя; корзина создается, если ее нет.
+
+    Корзина у пользователя одна (ограничение unique_user_basket), поэтому
+    поиск и создание - один INSERT ... ON CONFLICT по частичному уникальному
+    индексу: параллельные запросы получают одну и ту же корзину, а не
+    создают вторую. id кэшируется в Redis на BASKET_ID_CACHE_TIMEOUT.
+
+    Кэшированный id может устареть (оформление, удаление заказа, другая база
+    за тем же Redis), поэтому запись в корзину проверяет его в том же запросе:
+    заказ должен существовать, принадлежать пользователю и быть корзиной.
+    Если проверка не прошла, id запрашивается заново с cached=False.
+    """
+    key = basket_cache_key(user_id)
+    if cached:
+        order_id = cache.get(key)
+        if order_id:
+            return order_id
+    with connection.cursor() as cursor:
+        # DO UPDATE, а не DO NOTHING: только так RETURNING отдает id уже
+        # существующей корзины
+        cursor.execute(
+            f"""
+            INSERT INTO {Order._meta.db_table} (
+                user_id, status, dt, total_sum, items_count
+            )
+            VALUES (%s, 'basket', now(), 0, 0)
+            ON CONFLICT (user_id) WHERE status = 'basket'
+            DO UPDATE SET status = EXCLUDED.status
+            RETURNING id
+            """,
+            [user_id],
+        )
+        order_id = cursor.fetchone()[0]
+    cache.set(key, order_id, settings.BASKET_ID_CACHE_TIMEOUT)
+    return order_id
+
+
+def close_basket(user_id):
+    """Сбрасывает кэш id корзины после фиксации транзакции."""
+    transaction.on_commit(partial(cache.delete, basket_cache_key(user_id)))
+
+
+def refresh_order_totals(order_ids):
+    """
+    Пересчитывает сумму и число позиций заказов одним запросом.
+
+    Считается только по таблице позиций (количество на зафиксированную цену),
+    поэтому вызывается в той же транзакции, что и изменение позиций.
+    """
+    if not order_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Order._meta.db_table} AS o
+            SET total_sum = COALESCE(totals.total_sum, 0),
+                items_count = COALESCE(totals.items_count, 0)
+            FROM unnest(%(orders)s::bigint[]) AS target (order_id)
+            LEFT JOIN (
+                SELECT order_id, SUM(quantity::bigint * price) AS total_sum,
+                       COUNT(*) AS items_count
+                FROM {OrderItem._meta.db_table}
+                WHERE order_id = ANY(%(orders)s::bigint[])
+                GROUP BY order_id
+            ) AS totals ON totals.order_id = target.order_id
+            WHERE o.id = target.order_id
+            """,
+            {"orders": list(order_ids)},
+        )
+
+
+def snapshot_order_prices(order_id):
+    """Фиксирует в позициях заказа текущие цены и пересчитывает итоги заказа."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {OrderItem._meta.db_table} AS oi
+            SET price = pi.price
+            FROM {ProductInfo._meta.db_table} AS pi
+            WHERE oi.order_id = %s AND pi.id = oi.product_info_id
+            """,
+            [order_id],
+        )
+        refresh_order_totals([order_id])
+
+
+def parse_basket_items(items):
+    """
+    Строки корзины из запроса: список {"product_info": id, "quantity": n}.
+
+    Список может прийти как JSON-массив или строкой с JSON (из формы).
+    Возвращает список строк как есть; формат каждой строки проверяет
+    add_to_basket, чтобы ошибка одной строки не отменяла остальные.
+    """
+    if isinstance(items, str):
+        items = load_json(items)
+    if not isinstance(items, list):
+        raise ValueError("items должен быть списком позиций")
+    return items
+
+
+def line_error(number, line, error, key="product_info"):
+    return {
+        "line": number,
+        "product_info": line.get(key) if isinstance(line, dict) else None,
+        "Status": False,
+        "Error": error,
+    }
+
+
+def add_to_basket(user_id, items):
+    """
+    Пакетно добавляет строки в корзину пользователя.
+
+    Позиции и остатки проверяются одним запросом для всех строк: позиция должна
+    существовать в активном магазине, а количество с учетом уже лежащего в
+    корзине - не превышать остаток. Повторы одной позиции в запросе
+    складываются. Прошедшие проверку строки пишутся одним
+    INSERT ... ON CONFLICT в одной транзакции: новые позиции добавляются, у
+    существующих количество увеличивается, цена берется текущая. В той же
+    транзакции пересчитываются итоги корзины. Число запросов не зависит от
+    числа строк.
+
+    Возвращает результаты по строкам в порядке запроса и число измененных
+    позиций корзины.
+    """
+    parsed = [None] * len(items)
+    requested = {}
+    for number, line in enumerate(items):
+        product_info_id = line.get("product_info") if isinstance(line, dict) else None
+        quantity = line.get("quantity") if isinstance(line, dict) else None
+        if not isinstance(product_info_id, int) or not isinstance(quantity, int):
+            parsed[number] = line_error(
+                number, line, "Ожидаются целые product_info и quantity"
+            )
+        elif quantity <= 0:
+            parsed[number] = line_error(
+                number, line, "Количество должно быть больше нуля"
+            )
+        else:
+            requested.setdefault(product_info_id, []).append(number)
+
+    # Первая попытка - с id корзины из кэша. Если заказ с этим id уже не
+    # корзина пользователя, INSERT ничего не пишет, и строки проверяются и
+    # пишутся заново в корзину, полученную запросом
+    for cached in (True, False):
+        order_id = basket_id(user_id, cached)
+        results = list(parsed)
+        stock = {
+            row["id"]: row
+            for row in ProductInfo.objects.filter(
+                id__in=list(requested), shop__status=True
+            )
+            .annotate(
+                in_basket=Subquery(
+                    OrderItem.objects.filter(
+                        order_id=order_id,
+                        order__user_id=user_id,
+                        order__status="basket",
+                        product_info_id=OuterRef("pk"),
+                    ).values("quantity")[:1]
+                )
+            )
+            .values("id", "shop_id", "quantity", "price", "in_basket")
+        }
+        rows = []
+        for product_info_id, numbers in requested.items():
+            row = stock.get(product_info_id)
+            if row is None:
+                for number in numbers:
+                    results[number] = line_error(
+                        number, items[number], "Позиция не найдена или недоступна"
+                    )
+                continue
+            quantity = sum(items[number]["quantity"] for number in numbers)
+            if (row["in_basket"] or 0) + quantity > row["quantity"]:
+                for number in numbers:
+                    results[number] = line_error(
+                        number,
+                        items[number],
+                        f"Недостаточно товара на складе (доступно {row['quantity']})",
+                    )
+                continue
+            rows.append((product_info_id, row["shop_id"], quantity, row["price"]))
+
+        written = {}
+        if rows:
+            product_info_ids, shop_ids, quantities, prices = zip(*rows)
+            table = OrderItem._meta.db_table
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (
+                        order_id, product_info_id, shop_id, quantity, price
+                    )
+                    SELECT o.id, line.product_info_id, line.shop_id,
+                           line.quantity, line.price
+                    FROM unnest(%(product_infos)s::bigint[], %(shops)s::bigint[],
+                                %(quantities)s::int[], %(prices)s::int[])
+                         AS line (product_info_id, shop_id, quantity, price)
+                    JOIN {Order._meta.db_table} AS o
+                      ON o.id = %(order)s AND o.user_id = %(user)s
+                     AND o.status = 'basket'
+                    ON CONFLICT (order_id, product_info_id) DO UPDATE
+                    SET quantity = {table}.quantity + EXCLUDED.quantity,
+                        price = EXCLUDED.price
+                    RETURNING id, product_info_id, quantity
+                    """,
+                    {
+                        "order": order_id,
+                        "user": user_id,
+                        "product_infos": list(product_info_ids),
+                        "shops": list(shop_ids),
+                        "quantities": list(quantities),
+                        "prices": list(prices),
+                    },
+                )
+                written = {
+                    product_info_id: (item_id, quantity)
+                    for item_id, product_info_id, quantity in cursor.fetchall()
+                }
+                if written:
+                    refresh_order_totals([order_id])
+        if written or not rows:
+            break
+    for product_info_id, (item_id, quantity) in written.items():
+        for number in requested[product_info_id]:
+            results[number] = {
+                "line": number,
+                "product_info": product_info_id,
+                "Status": True,
+                "id": item_id,
+                "quantity": quantity,
+            }
+    return results, len(written)
+
+
+def update_basket(user_id, items):
+    """
+    Пакетно меняет количество позиций в корзине пользователя.
+
+    Строки запроса - {"id": <id позиции товара>, "quantity": n}; при повторе
+    позиции действует последняя строка. Все изменения применяются одним
+    UPDATE ... FROM unnest(...), в том же запросе количество сверяется с
+    остатком, и по каждой строке возвращается, применена ли она и почему нет.
+    Время ответа не зависит от числа строк.
+
+    Возвращает результаты по строкам в порядке запроса и число измененных
+    позиций корзины.
+    """
+    order_id = basket_id(user_id)
+    results = [None] * len(items)
+    error = partial(line_error, key="id")
+    requested = {}
+    for number, line in enumerate(items):
+        product_info_id = line.get("id") if isinstance(line, dict) else None
+        quantity = line.get("quantity") if isinstance(line, dict) else None
+        if not isinstance(product_info_id, int) or not isinstance(quantity, int):
+            results[number] = error(number, line, "Ожидаются целые id и quantity")
+        elif quantity <= 0:
+            results[number] = error(number, line, "Количество должно быть больше нуля")
+        else:
+            previous = requested.get(product_info_id)
+            if previous:
+                results[previous[0]] = error(
+                    previous[0], items[previous[0]], "Позиция повторяется в запросе"
+                )
+            requested[product_info_id] = (number, quantity)
+    if not requested:
+        return results, 0
+
+    table = OrderItem._meta.db_table
+    product_info_table = ProductInfo._meta.db_table
+    # Как и в add_to_basket: id из кэша проверяется в самом запросе, при
+    # несовпадении запрос повторяется с корзиной, полученной из базы
+    for cached in (True, False):
+        order_id = basket_id(user_id, cached)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH basket AS (
+                    SELECT id
+                    FROM {Order._meta.db_table}
+                    WHERE id = %(order)s AND user_id = %(user)s
+                      AND status = 'basket'
+                ),
+                line AS (
+                    SELECT *
+                    FROM unnest(%(product_infos)s::bigint[], %(quantities)s::int[])
+                         AS line (product_info_id, quantity)
+                ),
+                updated AS (
+                    UPDATE {table} AS oi
+                    SET quantity = line.quantity, price = pi.price
+                    FROM basket, line, {product_info_table} AS pi
+                    WHERE oi.order_id = basket.id
+                      AND oi.product_info_id = line.product_info_id
+                      AND pi.id = line.product_info_id
+                      AND line.quantity <= pi.quantity
+                    RETURNING oi.id, oi.product_info_id
+                )
+                SELECT basket.id IS NOT NULL, line.product_info_id,
+                       oi.id IS NOT NULL, pi.quantity, updated.id
+                FROM line
+                LEFT JOIN basket ON TRUE
+                LEFT JOIN {table} AS oi
+                    ON oi.order_id = basket.id
+                   AND oi.product_info_id = line.product_info_id
+                LEFT JOIN {product_info_table} AS pi
+                    ON pi.id = line.product_info_id
+                LEFT JOIN updated ON updated.product_info_id = line.product_info_id
+                """,
+                {
+                    "order": order_id,
+                    "user": user_id,
+                    "product_infos": list(requested),
+                    "quantities": [quantity for _, quantity in requested.values()],
+                },
+            )
+            rows = cursor.fetchall()
+            if rows[0][0]:
+                refresh_order_totals([order_id])
+                break
+    updated = 0
+    for _, product_info_id, in_basket, stock, item_id in rows:
+        number, quantity = requested[product_info_id]
+        if item_id is not None:
+            updated += 1
+            results[number] = {
+                "line": number,
+                "product_info": product_info_id,
+                "Status": True,
+                "id": item_id,
+                "quantity": quantity,
+            }
+        elif not in_basket:
+            results[number] = error(number, items[number], "Позиции нет в корзине")
+        else:
+            results[number] = error(
+                number,
+                items[number],
+                f"Недостаточно товара на складе (доступно {stock})",
+            )
+    return results, updated
+
+
+def remove_from_basket(user_id, item_ids):
+    """
+    Удаляет позиции из корзины пользователя одним запросом.
+
+    Позиции ищутся по id среди позиций корзины пользователя, поэтому id
+    корзины (и его кэш) не нужен. Итоги корзины пересчитываются в той же
+    транзакции. Возвращает число удаленных позиций.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {OrderItem._meta.db_table} AS oi
+            USING {Order._meta.db_table} AS o
+            WHERE o.id = oi.order_id AND o.user_id = %(user)s
+              AND o.status = 'basket' AND oi.id = ANY(%(items)s::bigint[])
+            RETURNING oi.order_id
+            """,
+            {"user": user_id, "items": list(item_ids)},
+        )
+        order_ids = {order_id for (order_id,) in cursor.fetchall()}
+        refresh_order_totals(order_ids)
+    return cursor.rowcount
+
+
+class StockShortage(Exception):
+    """Остатка не хватает для части позиций заказа; транзакция откатывается."""
+
+    def __init__(self, lines):
+        super().__init__(lines)
+        self.lines = lines
+
+
+def checkout(user_id, order_id, contact_id):
+    """
+    Оформляет корзину: резервирует остатки и переводит заказ в статус new.
+
+    Все делается в одной транзакции:
+    - статус меняется условным UPDATE (только из basket), поэтому повторное
+      или параллельное оформление той же корзины не проходит;
+    - строки остатков позиций заказа блокируются в порядке id, так что
+      встречные заказы с общими товарами не взаимоблокируются, а остальной
+      каталог не блокируется;
+    - остатки уменьшаются одним условным UPDATE (quantity >= заказанного).
+      Если хоть одна позиция не набирается, транзакция откатывается и
+      возвращаются недостающие позиции с доступным остатком;
+    - цены позиций фиксируются, итоги заказа и витрина каталога обновляются,
+      после фиксации сбрасывается кэш id корзины.
+
+    Возвращает (True, []) или (False, позиции с нехваткой). None вместо
+    результата - корзина не найдена или пуста.
+    """
+    order_table = Order._meta.db_table
+    item_table = OrderItem._meta.db_table
+    product_info_table = ProductInfo._meta.db_table
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {order_table}
+                SET status = 'new', contact_id = %(contact)s
+                WHERE id = %(order)s AND user_id = %(user)s AND status = 'basket'
+                  AND EXISTS (
+                      SELECT 1 FROM {item_table} WHERE order_id = %(order)s
+                  )
+                """,
+                {"order": order_id, "user": user_id, "contact": contact_id},
+            )
+            if not cursor.rowcount:
+                return None
+            close_basket(user_id)
+            cursor.execute(
+                f"""
+                SELECT pi.id, pi.shop_id, pi.quantity, oi.quantity
+                FROM {product_info_table} AS pi
+                JOIN {item_table} AS oi ON oi.product_info_id = pi.id
+                WHERE oi.order_id = %s
+                ORDER BY pi.id
+                FOR UPDATE OF pi
+                """,
+                [order_id],
+            )
+            lines = cursor.fetchall()
+            cursor.execute(
+                f"""
+                UPDATE {product_info_table} AS pi
+                SET quantity = pi.quantity - oi.quantity
+                FROM {item_table} AS oi
+                WHERE oi.order_id = %s
+                  AND pi.id = oi.product_info_id
+                  AND pi.quantity >= oi.quantity
+                RETURNING pi.id
+                """,
+                [order_id],
+            )
+            reserved = {row[0] for row in cursor.fetchall()}
+            if len(reserved) < len(lines):
+                raise StockShortage(
+                    [
+                        {
+                            "product_info": product_info_id,
+                            "quantity": quantity,
+                            "available": available,
+                        }
+                        for product_info_id, _, available, quantity in lines
+                        if product_info_id not in reserved
+                    ]
+                )
+            snapshot_order_prices(order_id)
+            refresh_catalog_entries(reserved)
+            for shop_id in {shop_id for _, shop_id, _, _ in lines}:
+                bump_catalog_version_on_commit(shop_id)
+    except StockShortage as shortage:
+        return False, shortage.lines
+    return True, []
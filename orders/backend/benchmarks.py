@@ -0,0 +1,445 @@
+import csv
+import gc
+import io
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from ujson import dumps as dump_json
+from yaml import dump as dump_yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from .basket import add_to_basket, checkout
+from .catalog import refresh_catalog_entries
+from .importer import import_price_list
+from .models import (
+    CatalogEntry,
+    Category,
+    ContactInfo,
+    CustomUser,
+    Order,
+    Product,
+    ProductInfo,
+    Shop,
+)
+from .readers import open_price_list
+from .serializers import (
+    CATALOG_ENTRY_COLUMNS,
+    ProductInfoSerializer,
+    serialize_catalog_entries,
+)
+from .tasks import get_import
+
+COLORS = ("черный", "белый", "красный", "синий", "золотистый", "серебристый")
+BRANDS = ("Apple", "Samsung", "Xiaomi", "Huawei", "Sony", "LG", "Philips", "Asus")
+PARAMETER_NAMES = (
+    "Диагональ (дюйм)",
+    "Разрешение (пикс)",
+    "Встроенная память (Гб)",
+    "Цвет",
+    "Вес (г)",
+    "Гарантия (мес)",
+    "Материал корпуса",
+    "Емкость аккумулятора (мАч)",
+)
+
+
+def generate_price_list(goods_count, seed=0, shop="Синтетический магазин"):
+    """
+    Синтетический прайс по схеме data/shop1.yaml.
+
+    Возвращает заголовок {"shop", "categories"} и генератор товаров. Число
+    категорий растет с размером прайса (но не больше 500), у каждого товара от
+    4 до 8 параметров из общего набора, названия продуктов повторяются у
+    соседних предложений, как у вариантов одной модели.
+    """
+    categories_count = min(max(goods_count // 2000, 4), 500)
+    header = {
+        "shop": shop,
+        "categories": [
+            {"id": number, "name": f"Категория {number}"}
+            for number in range(1, categories_count + 1)
+        ],
+    }
+
+    def goods():
+        generator = random.Random(seed)
+        for number in range(1, goods_count + 1):
+            brand = generator.choice(BRANDS)
+            model = number // 3
+            names = generator.sample(PARAMETER_NAMES, generator.randint(4, 8))
+            parameters = {
+                name: (
+                    generator.choice(COLORS)
+                    if name == "Цвет"
+                    else generator.choice((6.1, 6.5, 128, 256, 512, "2688x1242"))
+                )
+                for name in names
+            }
+            price = generator.randrange(1000, 200000, 10)
+            yield {
+                "id": 1000000 + number,
+                "category": generator.randint(1, categories_count),
+                "model": f"{brand.lower()}/model-{model}",
+                "name": f"{brand} Model {model} ({parameters.get('Цвет', 'черный')})",
+                "price": price,
+                "price_rrc": price + price // 10,
+                "quantity": generator.randint(0, 100),
+                "parameters": parameters,
+            }
+
+    return header, goods
+
+
+def write_yaml(stream, header, goods):
+    stream.write(dump_yaml(header, Dumper=SafeDumper, allow_unicode=True))
+    stream.write("goods:\n")
+    for item in goods:
+        stream.write(
+            dump_yaml([item], Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
+        )
+
+
+def write_json(stream, header, goods):
+    # Товары пишутся по одному, чтобы не держать весь прайс в памяти
+    stream.write(dump_json(header, ensure_ascii=False)[:-1])
+    stream.write(',"goods":[')
+    for number, item in enumerate(goods):
+        if number:
+            stream.write(",")
+        stream.write(dump_json(item, ensure_ascii=False))
+    stream.write("]}")
+
+
+def write_ndjson(stream, header, goods):
+    stream.write(dump_json(header, ensure_ascii=False))
+    stream.write("\n")
+    for item in goods:
+        stream.write(dump_json(item, ensure_ascii=False))
+        stream.write("\n")
+
+
+def write_csv(stream, header, goods, parameter_names=PARAMETER_NAMES):
+    categories = {category["id"]: category["name"] for category in header["categories"]}
+    fields = ["id", "category", "model", "name", "price", "price_rrc", "quantity"]
+    writer = csv.writer(stream)
+    writer.writerow(
+        ["shop", "category_name"]
+        + fields
+        + [f"param:{name}" for name in parameter_names]
+    )
+    for item in goods:
+        writer.writerow(
+            [header["shop"], categories[item["category"]]]
+            + [item[field] for field in fields]
+            + [item["parameters"].get(name, "") for name in parameter_names]
+        )
+
+
+PRICE_LIST_WRITERS = {
+    "yaml": write_yaml,
+    "json": write_json,
+    "ndjson": write_ndjson,
+    "csv": write_csv,
+}
+
+
+def write_price_list(stream, price_format, header, goods):
+    """Пишет прайс в бинарный поток в указанном формате."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    PRICE_LIST_WRITERS[price_format](text, header, goods)
+    text.flush()
+    text.detach()
+
+
+def benchmark_formats(goods_count, formats=tuple(PRICE_LIST_WRITERS), seed=0):
+    """Скорость разбора одного и того же синтетического прайса в разных форматах."""
+    results = []
+    for price_format in formats:
+        header, goods = generate_price_list(goods_count, seed)
+        with tempfile.TemporaryFile() as stream:
+            write_price_list(stream, price_format, header, goods())
+            size = stream.tell()
+            stream.seek(0)
+            started = time.perf_counter()
+            parsed = sum(1 for _ in open_price_list(stream, price_format).goods())
+            seconds = time.perf_counter() - started
+        results.append(
+            {
+                "format": price_format,
+                "goods": parsed,
+                "bytes": size,
+                "seconds": round(seconds, 3),
+                "goods_per_sec": round(parsed / seconds) if seconds else parsed,
+            }
+        )
+    return results
+
+
+class QuietRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    }
+}
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Временная тестовая база и отдельный кэш на время замера.
+
+    Рабочая база не трогается. Кэш подменяется на локальный в памяти
+    процесса: ключи корзин и версий каталога тестовой базы иначе попали бы в
+    общий Redis рядом с ключами настоящих пользователей и магазинов. После
+    замера кэш очищается, тестовая база удаляется (кроме keepdb).
+    """
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            try:
+                yield
+            finally:
+                cache.clear()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+@contextmanager
+def serve_directory(directory):
+    """Локальный HTTP-сервер, раздающий каталог вместо сайта поставщика."""
+    handler = partial(QuietRequestHandler, directory=str(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class QueryCounter:
+    """Считает запросы к базе через connection.execute_wrapper()."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def peak_rss_mb():
+    # На Linux ru_maxrss в килобайтах, на macOS - в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 ** (2 if os.uname().sysname == "Darwin" else 1), 1)
+
+
+def benchmark_import(
+    goods_count,
+    price_format="yaml",
+    directory=None,
+    seed=0,
+    batch_size=None,
+    mode=None,
+):
+    """
+    Сквозной замер get_import на синтетическом прайсе.
+
+    Прайс пишется в файл и раздается локальным HTTP-сервером, так что сеть не
+    нужна. Делается два прогона: первичный импорт в пустой магазин и повторный
+    импорт того же прайса (сохраненные ETag и хэш фида сбрасываются, чтобы импорт не был пропущен).
+    Для каждого прогона возвращаются время, число запросов к базе, скорость и
+    пиковый RSS процесса.
+    """
+    header, goods = generate_price_list(
+        goods_count, seed, shop=f"Синтетический магазин {goods_count}"
+    )
+    with tempfile.TemporaryDirectory(dir=directory) as spool:
+        filename = f"shop-{goods_count}.{price_format}"
+        with open(os.path.join(spool, filename), "wb") as stream:
+            write_price_list(stream, price_format, header, goods())
+            size = stream.tell()
+        partner = CustomUser.objects.create_user(
+            email=f"benchmark-{goods_count}@example.com",
+            username=f"benchmark-{goods_count}",
+            type="shop",
+            is_active=True,
+        )
+        results = []
+        with serve_directory(spool) as url:
+            for run in ("initial", "repeat"):
+                Shop.objects.filter(user=partner).update(
+                    feed_etag="", feed_last_modified="", feed_hash=""
+                )
+                counter = QueryCounter()
+                started = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    result = get_import(
+                        partner.id, f"{url}/{filename}", batch_size, mode
+                    )
+                seconds = time.perf_counter() - started
+                if not result["Status"]:
+                    raise RuntimeError(result.get("Error") or result.get("Errors"))
+                stats = result["Stats"]
+                results.append(
+                    {
+                        "run": run,
+                        "format": price_format,
+                        "goods": stats["goods"],
+                        "bytes": size,
+                        "seconds": round(seconds, 3),
+                        "queries": counter.count,
+                        "rows_per_sec": round(stats["goods"] / seconds),
+                        "inserted": stats["inserted"],
+                        "updated": stats["updated"],
+                        "unchanged": stats["unchanged"],
+                        "peak_rss_mb": peak_rss_mb(),
+                    }
+                )
+    return results
+
+
+def benchmark_catalog_serializers(rows_count, seed=0, repeat=3):
+    """
+    Скорость сериализации страницы каталога: ProductInfoSerializer против
+    serialize_catalog_entries на одних и тех же позициях.
+
+    Позиции импортируются из синтетического прайса. Строки читаются из базы
+    заранее, замеряется только построение данных ответа (лучший из repeat
+    прогонов). Заодно проверяется, что JSON обоих путей совпадает байт в байт.
+    """
+    header, goods = generate_price_list(rows_count, seed)
+    shop = Shop.objects.create(name=f"Синтетический магазин {rows_count}")
+    import_price_list(shop, header["categories"], list(goods()))
+    objects = list(
+        ProductInfo.objects.filter(shop=shop)
+        .select_related("product__category")
+        .prefetch_related("product_parameters__parameter")
+        .order_by("id")
+    )
+    rows = list(
+        CatalogEntry.objects.filter(shop=shop)
+        .order_by("product_info_id")
+        .values(*CATALOG_ENTRY_COLUMNS)
+    )
+
+    def best_of(build):
+        # Как в timeit: сборщик мусора на время замера выключен, иначе его
+        # проход по всем объектам процесса попадает в один из путей
+        timings = []
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                data = build()
+                timings.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+        return min(timings), data
+
+    drf_seconds, drf_data = best_of(
+        lambda: ProductInfoSerializer(objects, many=True).data
+    )
+    fast_seconds, fast_data = best_of(lambda: serialize_catalog_entries(rows))
+    renderer = JSONRenderer()
+    return {
+        "rows": len(rows),
+        "drf_seconds": round(drf_seconds, 4),
+        "fast_seconds": round(fast_seconds, 4),
+        "speedup": round(drf_seconds / fast_seconds, 1),
+        "identical": renderer.render(drf_data) == renderer.render(fast_data),
+    }
+
+
+def benchmark_checkout(buyers, stock, quantity=1, workers=16):
+    """
+    Параллельное оформление заказов на один и тот же товар.
+
+    Каждый из buyers покупателей кладет в корзину quantity единиц позиции с
+    остатком stock, затем все корзины оформляются одновременно из workers
+    потоков, у каждого свое соединение с базой. Проверяется, что успешно
+    оформлено ровно столько заказов, сколько позволяет остаток, и что
+    проданное количество сходится с остатком (oversold == 0).
+    """
+    shop = Shop.objects.create(name=f"Синтетический магазин {buyers}")
+    category = Category.objects.create(name="Синтетическая категория")
+    product = Product.objects.create(name="Ходовой товар", category=category)
+    product_info = ProductInfo.objects.create(
+        model="checkout",
+        external_id=1,
+        product=product,
+        shop=shop,
+        quantity=stock,
+        price=100,
+        price_rrc=120,
+    )
+    refresh_catalog_entries([product_info.id])
+    users = CustomUser.objects.bulk_create(
+        CustomUser(
+            email=f"buyer-{number}@example.com",
+            username=f"buyer-{number}",
+            is_active=True,
+        )
+        for number in range(buyers)
+    )
+    contacts = ContactInfo.objects.bulk_create(
+        ContactInfo(user=user, city="Москва", street="Тверская", phone="+70000000000")
+        for user in users
+    )
+    for user in users:
+        add_to_basket(
+            user.id, [{"product_info": product_info.id, "quantity": quantity}]
+        )
+    baskets = dict(
+        Order.objects.filter(user__in=users, status="basket").values_list(
+            "user_id", "id"
+        )
+    )
+
+    def place_order(user, contact):
+        try:
+            return checkout(user.id, baskets[user.id], contact.id)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(place_order, users, contacts))
+    seconds = time.perf_counter() - started
+    succeeded = sum(1 for result in results if result and result[0])
+    remaining = ProductInfo.objects.get(id=product_info.id).quantity
+    return {
+        "buyers": buyers,
+        "stock": stock,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "remaining": remaining,
+        "oversold": succeeded * quantity + remaining - stock,
+        "seconds": round(seconds, 3),
+        "checkouts_per_sec": round(len(results) / seconds, 1),
+    }
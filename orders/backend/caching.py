@@ -0,0 +1,149 @@
+import hashlib
+import time
+from functools import partial
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.cache import cache_control
+from rest_framework.response import Response
+from rest_framework.status import HTTP_304_NOT_MODIFIED
+
+CATALOG_VERSION_KEY = "catalog:version"
+SHARED_VERSION_KEY = "catalog:version:shared"
+CATALOG_CACHE_SCOPES = ("products", "facets", "suggest", "categories", "shops")
+
+# Ответы каталога кэшируются по версиям (см. cached_catalog_response), поэтому
+# общий CacheMiddleware их не сохраняет (private), а клиенты переспрашивают
+# сервер с If-None-Match (no-cache) и получают 304, пока каталог не изменился
+catalog_cache_control = cache_control(private=True, no_cache=True)
+
+
+def shop_version_key(shop_id):
+    return f"catalog:version:shop:{shop_id}"
+
+
+def initial_version():
+    # Версия после вытеснения ключа не совпадет ни с одной из прежних
+    return time.time_ns() // 1000
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def increment(key, initial=None):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version() if initial is None else initial, timeout=None)
+
+
+def bump_catalog_version(shop_id=None):
+    """
+    Делает недействительными закэшированные ответы каталога.
+
+    С shop_id меняется версия магазина, без него - версия общих данных
+    (категории, продукты, параметры). Общая версия каталога меняется всегда.
+    Старые записи не удаляются, а просто перестают читаться и истекают сами.
+    """
+    increment(CATALOG_VERSION_KEY)
+    increment(SHARED_VERSION_KEY if shop_id is None else shop_version_key(shop_id))
+
+
+def bump_catalog_version_on_commit(shop_id=None):
+    """Меняет версию после фиксации транзакции, чтобы не закэшировать старые данные."""
+    transaction.on_commit(partial(bump_catalog_version, shop_id))
+
+
+def catalog_cache_key(request, scope, shop_id=None):
+    """
+    Ключ кэша: область, версии, хост и нормализованные параметры запроса.
+
+    Ответ с фильтром по магазину зависит только от версий магазина и общих
+    данных, остальные ответы - от общей версии каталога.
+    """
+    if shop_id:
+        keys = [shop_version_key(shop_id), SHARED_VERSION_KEY]
+    else:
+        keys = [CATALOG_VERSION_KEY]
+    versions = ".".join(str(version) for version in get_versions(keys))
+    params = urlencode(
+        sorted(
+            (key, value)
+            for key in request.query_params
+            for value in request.query_params.getlist(key)
+        )
+    )
+    digest = hashlib.md5(f"{request.get_host()}?{params}".encode()).hexdigest()
+    return f"catalog:{scope}:{versions}:{digest}"
+
+
+def record_cache_stat(scope, hit):
+    increment(f"catalog:stats:{scope}:{'hits' if hit else 'misses'}", initial=1)
+
+
+def catalog_etag(request, key):
+    """Сильный ETag ответа: ключ кэша (версии и параметры) и формат вывода."""
+    representation = f"{key}:{request.accepted_renderer.format}"
+    return quote_etag(hashlib.md5(representation.encode()).hexdigest())
+
+
+def cached_catalog_response(request, scope, build, shop_id=None):
+    """
+    Отдает данные ответа из кэша или строит их вызовом build().
+
+    В кэш попадают только успешные ответы. Заголовок X-Cache показывает,
+    был ли ответ взят из кэша (HIT) или построен заново (MISS). Успешные
+    ответы получают ETag из версий каталога; если он совпал с If-None-Match,
+    сразу отдается 304 без запросов к базе и сериализации.
+    """
+    key = catalog_cache_key(request, scope, shop_id)
+    etag = catalog_etag(request, key)
+    if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    if etag in if_none_match or "*" in if_none_match:
+        response = Response(status=HTTP_304_NOT_MODIFIED)
+        response["ETag"] = etag
+        return response
+    data = cache.get(key)
+    record_cache_stat(scope, data is not None)
+    if data is not None:
+        response = Response(data)
+        response["X-Cache"] = "HIT"
+        response["ETag"] = etag
+        return response
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+        response["ETag"] = etag
+    response["X-Cache"] = "MISS"
+    return response
+
+
+def catalog_cache_stats():
+    """Число попаданий и промахов кэша каталога и доля попаданий по областям."""
+    counters = cache.get_many(
+        [
+            f"catalog:stats:{scope}:{kind}"
+            for scope in CATALOG_CACHE_SCOPES
+            for kind in ("hits", "misses")
+        ]
+    )
+    stats = {}
+    for scope in CATALOG_CACHE_SCOPES:
+        hits = counters.get(f"catalog:stats:{scope}:hits", 0)
+        misses = counters.get(f"catalog:stats:{scope}:misses", 0)
+        total = hits + misses
+        stats[scope] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+        }
+    return stats
@@ -0,0 +1,131 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from .models import (
+    CatalogEntry,
+    Category,
+    Parameter,
+    Product,
+    ProductInfo,
+    ProductParameter,
+    Shop,
+)
+
+
+def refresh_search_vectors(ids):
+    """
+    Пересчитывает поисковый вектор позиций одним запросом.
+
+    Вес A - название продукта, B - модель, C - значения параметров.
+    """
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {ProductInfo._meta.db_table} AS pi
+            SET search_vector =
+                setweight(to_tsvector(%(config)s::regconfig, p.name), 'A')
+                || setweight(to_tsvector(
+                    %(config)s::regconfig, translate(pi.model, '/', ' ')
+                ), 'B')
+                || setweight(to_tsvector(%(config)s::regconfig, coalesce(
+                    (SELECT string_agg(pp.value, ' ')
+                     FROM {ProductParameter._meta.db_table} AS pp
+                     WHERE pp.product_info_id = pi.id),
+                    ''
+                )), 'C')
+            FROM {Product._meta.db_table} AS p
+            WHERE p.id = pi.product_id AND pi.id = ANY(%(ids)s)
+            """,
+            {"config": settings.PRODUCTS_SEARCH_CONFIG, "ids": list(ids)},
+        )
+
+
+def refresh_catalog_entries(ids):
+    """
+    Пересчитывает строки витрины каталога для позиций ids одним запросом.
+
+    Отсутствующие строки добавляются, существующие перезаписываются. Параметры
+    собираются в порядке выдачи API: по убыванию названия параметра.
+    """
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {CatalogEntry._meta.db_table} (
+                product_info_id, shop_id, shop_name, category_id, category_name,
+                product_id, product_name, model, external_id, quantity, price,
+                price_rrc, parameters
+            )
+            SELECT pi.id, s.id, s.name, c.id, c.name, p.id, p.name, pi.model,
+                   pi.external_id, pi.quantity, pi.price, pi.price_rrc,
+                   COALESCE(
+                       (SELECT jsonb_agg(
+                            jsonb_build_array(pa.name, pp.value)
+                            ORDER BY pa.name DESC
+                        )
+                        FROM {ProductParameter._meta.db_table} AS pp
+                        JOIN {Parameter._meta.db_table} AS pa
+                          ON pa.id = pp.parameter_id
+                        WHERE pp.product_info_id = pi.id),
+                       '[]'::jsonb
+                   )
+            FROM {ProductInfo._meta.db_table} AS pi
+            JOIN {Shop._meta.db_table} AS s ON s.id = pi.shop_id
+            JOIN {Product._meta.db_table} AS p ON p.id = pi.product_id
+            JOIN {Category._meta.db_table} AS c ON c.id = p.category_id
+            WHERE pi.id = ANY(%s)
+            ON CONFLICT (product_info_id) DO UPDATE SET
+                shop_id = EXCLUDED.shop_id,
+                shop_name = EXCLUDED.shop_name,
+                category_id = EXCLUDED.category_id,
+                category_name = EXCLUDED.category_name,
+                product_id = EXCLUDED.product_id,
+                product_name = EXCLUDED.product_name,
+                model = EXCLUDED.model,
+                external_id = EXCLUDED.external_id,
+                quantity = EXCLUDED.quantity,
+                price = EXCLUDED.price,
+                price_rrc = EXCLUDED.price_rrc,
+                parameters = EXCLUDED.parameters
+            """,
+            [list(ids)],
+        )
+
+
+def refresh_catalog(ids):
+    """Обновляет поисковый вектор и витрину каталога для изменившихся позиций."""
+    refresh_search_vectors(ids)
+    refresh_catalog_entries(ids)
+
+
+def refresh_catalog_where(**filters):
+    """Пересчитывает витрину для всех позиций, отобранных фильтром ProductInfo."""
+    ids = (
+        ProductInfo.objects.filter(**filters)
+        .values_list("id", flat=True)
+        .iterator(chunk_size=settings.IMPORT_BATCH_SIZE)
+    )
+    while batch := list(islice(ids, settings.IMPORT_BATCH_SIZE)):
+        refresh_catalog(batch)
+
+
+def sync_category_names(ids):
+    """Переносит в витрину названия категорий ids, если они изменились."""
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {CatalogEntry._meta.db_table} AS ce
+            SET category_name = c.name
+            FROM {Category._meta.db_table} AS c
+            WHERE ce.category_id = c.id AND c.id = ANY(%s)
+              AND ce.category_name IS DISTINCT FROM c.name
+            """,
+            [list(ids)],
+        )
@@ -1,7 +1,32 @@
 import pytest
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.test import APIClient
+from yaml import load as load_yaml, SafeLoader
+
+from backend.benchmarks import serve_directory
+from orders.celery import celery_app
 from model_bakery import baker
 
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tests",
+    }
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    # Кэш тестов - в памяти процесса, а не в Redis: там же очередь и
+    # результаты Celery, и очистка стерла бы их. Версии каталога меняются
+    # только после фиксации транзакции, которой в тестах с откатом нет, поэтому
+    # кэш очищается до и после каждого теста
+    settings.CACHES = TEST_CACHES
+    cache.clear()
+    yield
+    cache.clear()
+
 
 @pytest.fixture
 def api_client():
@@ -70,3 +95,24 @@ def contact_factory():
     def factory(**kwargs):
         return baker.make("backend.ContactInfo", **kwargs)
     return factory
+
+
+@pytest.fixture
+def price_list():
+    with open(settings.BASE_DIR.parent / "data" / "shop1.yaml", "rb") as stream:
+        return load_yaml(stream, Loader=SafeLoader)
+
+
+@pytest.fixture
+def feed_server():
+    """Локальный HTTP-сервер, раздающий каталог data/ вместо сайта поставщика."""
+    with serve_directory(settings.BASE_DIR.parent / "data") as url:
+        yield url
+
+
+@pytest.fixture
+def celery_eager():
+    """Выполняет задачи Celery синхронно, без брокера и воркера."""
+    celery_app.conf.task_always_eager = True
+    yield celery_app
+    celery_app.conf.task_always_eager = False
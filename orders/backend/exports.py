@@ -0,0 +1,98 @@
+import csv
+import io
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.text import compress_sequence
+from ujson import dumps as dump_json
+
+from .importer import batched
+from .serializers import CATALOG_ENTRY_COLUMNS, serialize_catalog_entries
+
+CSV_COLUMNS = (
+    "id",
+    "model",
+    "external_id",
+    "product_id",
+    "product",
+    "category",
+    "shop",
+    "quantity",
+    "price",
+    "price_rrc",
+    "parameters",
+)
+
+
+def ndjson_chunks(rows):
+    """Строки каталога в NDJSON: один объект в форме выдачи /products на строку."""
+    for batch in rows:
+        yield "".join(
+            dump_json(item, ensure_ascii=False) + "\n"
+            for item in serialize_catalog_entries(batch)
+        )
+
+
+def csv_chunks(rows):
+    """
+    Строки каталога в CSV, одна позиция на строку.
+
+    Параметры позиции пишутся в колонку parameters JSON-объектом
+    {название: значение}, так как их набор у позиций разный.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for batch in rows:
+        for row in batch:
+            writer.writerow(
+                (
+                    row["product_info_id"],
+                    row["model"],
+                    row["external_id"],
+                    row["product_id"],
+                    row["product_name"],
+                    row["category_name"],
+                    row["shop_id"],
+                    row["quantity"],
+                    row["price"],
+                    row["price_rrc"],
+                    dump_json(dict(row["parameters"]), ensure_ascii=False),
+                )
+            )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+    "csv": (csv_chunks, "text/csv; charset=utf-8"),
+}
+
+
+def catalog_export_response(queryset, export_format, gzip=False):
+    """
+    Потоковая выгрузка строк витрины каталога в NDJSON или CSV.
+
+    Строки читаются серверным курсором (iterator) пачками по
+    CATALOG_EXPORT_CHUNK_SIZE, каждая пачка сразу уходит клиенту, поэтому
+    память не растет с размером каталога. С gzip=True поток сжимается на лету,
+    по кадру gzip на пачку.
+    """
+    write_chunks, content_type = EXPORT_FORMATS[export_format]
+    chunk_size = settings.CATALOG_EXPORT_CHUNK_SIZE
+    rows = (
+        queryset.order_by("product_info_id")
+        .values(*CATALOG_ENTRY_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+    chunks = (chunk.encode() for chunk in write_chunks(batched(rows, chunk_size)))
+    if gzip:
+        chunks = compress_sequence(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="catalog.{export_format}"'
+    response["Vary"] = "Accept-Encoding"
+    if gzip:
+        response["Content-Encoding"] = "gzip"
+    return response
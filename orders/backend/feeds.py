@@ -0,0 +1,146 @@
+import hashlib
+import os
+import tempfile
+import uuid
+
+import requests
+from django.conf import settings
+from django.core.files.move import file_move_safe
+
+from .models import ImportSkip
+
+
+class SupplierFeed:
+    """
+    Загрузка прайса поставщика с условным запросом.
+
+    Тело ответа порциями пишется во временный файл с подсчётом SHA-256, так что
+    в памяти не держится. Если сервер ответил 304 или хэш совпал с хэшем
+    последнего успешного импорта магазина, импорт можно пропустить.
+    """
+
+    def __init__(self, url, shop=None):
+        self.url = url
+        self.shop = shop
+        self.file = None
+        self.etag = ""
+        self.last_modified = ""
+        self.hash = ""
+        self.content_type = ""
+        self.size = 0
+        self.skip_reason = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.file is not None:
+            self.file.close()
+
+    def conditional_headers(self):
+        headers = {}
+        if self.shop is None or self.shop.feed_url != self.url:
+            return headers
+        if self.shop.feed_etag:
+            headers["If-None-Match"] = self.shop.feed_etag
+        if self.shop.feed_last_modified:
+            headers["If-Modified-Since"] = self.shop.feed_last_modified
+        return headers
+
+    def fetch(self):
+        with requests.get(
+            self.url,
+            headers=self.conditional_headers(),
+            stream=True,
+            timeout=settings.IMPORT_FETCH_TIMEOUT,
+        ) as response:
+            if response.status_code == 304:
+                self.skip_reason = "not_modified"
+                return self
+            response.raise_for_status()
+            self.etag = response.headers.get("ETag", "")
+            self.last_modified = response.headers.get("Last-Modified", "")
+            self.content_type = response.headers.get("Content-Type", "")
+            digest = hashlib.sha256()
+            self.file = tempfile.TemporaryFile()
+            for chunk in response.iter_content(settings.IMPORT_CHUNK_SIZE):
+                digest.update(chunk)
+                self.file.write(chunk)
+                self.size += len(chunk)
+        self.file.seek(0)
+        self.hash = digest.hexdigest()
+        if (
+            self.shop is not None
+            and self.shop.feed_url == self.url
+            and self.shop.feed_hash == self.hash
+        ):
+            self.skip_reason = "same_hash"
+        return self
+
+    def record_skip(self):
+        return ImportSkip.objects.create(
+            shop=self.shop, url=self.url, reason=self.skip_reason, size=self.size
+        )
+
+    @property
+    def validators(self):
+        return {
+            "feed_url": self.url,
+            "feed_etag": self.etag,
+            "feed_last_modified": self.last_modified,
+            "feed_hash": self.hash,
+        }
+
+    def remember(self, shop):
+        for field, value in self.validators.items():
+            setattr(shop, field, value)
+        shop.save(update_fields=list(self.validators))
+
+
+class LocalFeed(SupplierFeed):
+    """
+    Прайс, уже лежащий на диске (например, загруженный через partner/upload).
+
+    Файл читается через буферизованный дескриптор и удаляется после импорта.
+    Проверка на неизменность не делается: загрузку партнер запускает явно.
+    """
+
+    def __init__(self, path, shop=None):
+        super().__init__(path, shop)
+        self.path = path
+
+    def __exit__(self, *exc_info):
+        super().__exit__(*exc_info)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def fetch(self):
+        self.file = open(self.path, "rb", buffering=settings.IMPORT_CHUNK_SIZE)
+        self.size = os.fstat(self.file.fileno()).st_size
+        return self
+
+    @property
+    def validators(self):
+        # Каталог изменен в обход фида: следующий импорт по URL не пропускается
+        return {
+            "feed_url": "",
+            "feed_etag": "",
+            "feed_last_modified": "",
+            "feed_hash": "",
+        }
+
+
+def spool_upload(upload):
+    """
+    Переносит загруженный файл прайса в IMPORT_SPOOL_DIR/uploads.
+
+    Файл уже лежит на диске (TemporaryFileUploadHandler), поэтому он только
+    перемещается, а не читается в память. Расширение сохраняется для
+    определения формата. Возвращает путь к файлу для задачи импорта.
+    """
+    directory = os.path.join(settings.IMPORT_SPOOL_DIR, "uploads")
+    os.makedirs(directory, exist_ok=True)
+    extension = os.path.splitext(upload.name)[1].lower()
+    path = os.path.join(directory, f"{uuid.uuid4()}{extension}")
+    file_move_safe(upload.temporary_file_path(), path)
+    return path
@@ -0,0 +1,234 @@
+import re
+from functools import cache
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordDistance,
+)
+from django.db import connection, connections, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast
+from rest_framework.exceptions import ValidationError
+
+from .models import CatalogEntry, Parameter, ProductParameter
+
+PARAMETER_FILTER = re.compile(r"^param\[(?P<name>.+)\]$")
+CATALOG_ORDERING = ("price", "price_rrc", "quantity")
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def integer_param(query_params, name):
+    """Неотрицательное целое из строки запроса или None, если параметр не задан."""
+    value = query_params.get(name, "").strip()
+    if not value:
+        return None
+    if not value.isdigit():
+        raise ValidationError({name: "Ожидается неотрицательное целое число"})
+    return int(value)
+
+
+def catalog_ordering(query_params, queryset):
+    """
+    Порядок строк каталога для курсорной пагинации.
+
+    ordering=price|price_rrc|quantity (с минусом - по убыванию) сортирует по
+    индексу (поле, product_info), ключ позиции добавляется для однозначного
+    порядка. Без ordering результаты поиска идут по убыванию ранга, остальные -
+    по ключу. Курсор хранит значения всех полей порядка, поэтому равные цены
+    или ранги листаются по ключу, а не смещением. Ключ назван product_info_id,
+    а не pk, чтобы курсор читал его и из строк values().
+    Неизвестные значения ordering игнорируются.
+    """
+    ordering = query_params.get("ordering", "").strip()
+    if ordering.lstrip("-") in CATALOG_ORDERING:
+        descending = ordering.startswith("-")
+        return (ordering, "-product_info_id" if descending else "product_info_id")
+    if "rank" in queryset.query.annotations:
+        return ("-rank", "product_info_id")
+    return ("product_info_id",)
+
+
+def parameter_filters(query_params):
+    """
+    Фильтры по параметрам из строки запроса: {название: [значения]}.
+
+    param[Цвет]=красный&param[Цвет]=черный выбирает любое из значений, фильтры
+    по разным параметрам объединяются через И.
+    """
+    filters = {}
+    for key in query_params:
+        match = PARAMETER_FILTER.match(key)
+        if match:
+            values = [value for value in query_params.getlist(key) if value]
+            if values:
+                filters[match.group("name")] = values
+    return filters
+
+
+def filter_catalog(query_params):
+    """
+    Строки витрины каталога активных магазинов, отобранные параметрами запроса.
+
+    Поддерживаются shop_id, category_id, price_min и price_max (границы
+    включаются), in_stock (только товары в наличии), q (полнотекстовый поиск,
+    добавляет аннотацию rank) и param[<название>]. Фильтр по параметру - это
+    подзапрос EXISTS по индексу (product_info, parameter), сам параметр
+    ищется по названию заранее, без соединения с таблицей параметров.
+    """
+    query = Q(shop__status=True)
+    shop_id = query_params.get("shop_id")
+    category_id = query_params.get("category_id")
+    price_min = integer_param(query_params, "price_min")
+    price_max = integer_param(query_params, "price_max")
+    if shop_id:
+        query = query & Q(shop_id=shop_id)
+    if category_id:
+        query = query & Q(category_id=category_id)
+    if price_min is not None:
+        query = query & Q(price__gte=price_min)
+    if price_max is not None:
+        query = query & Q(price__lte=price_max)
+    if query_params.get("in_stock", "").strip().lower() in TRUE_VALUES:
+        query = query & Q(quantity__gt=0)
+    queryset = CatalogEntry.objects.filter(query)
+    filters = parameter_filters(query_params)
+    if filters:
+        parameters = dict(
+            Parameter.objects.filter(name__in=filters).values_list("name", "id")
+        )
+        if len(parameters) < len(filters):
+            return queryset.none()
+        for name, values in filters.items():
+            queryset = queryset.filter(
+                Exists(
+                    ProductParameter.objects.filter(
+                        product_info=OuterRef("pk"),
+                        parameter_id=parameters[name],
+                        value__in=values,
+                    )
+                )
+            )
+    search = query_params.get("q", "").strip()
+    if search:
+        # Поиск по названию, модели и значениям параметров (GIN-индекс)
+        search_query = SearchQuery(
+            search, config=settings.PRODUCTS_SEARCH_CONFIG, search_type="websearch"
+        )
+        # Ранг приводится к float8, чтобы курсор по нему сравнивался точно
+        queryset = queryset.filter(product_info__search_vector=search_query).annotate(
+            rank=Cast(
+                SearchRank(F("product_info__search_vector"), search_query),
+                output_field=FloatField(),
+            )
+        )
+    return queryset
+
+
+def parameter_facets(queryset):
+    """
+    Число позиций по значениям каждого параметра в выборке queryset.
+
+    Одним запросом группирует параметры отобранных позиций по индексу
+    (parameter, value, product_info): {название: [{"value", "count"}, ...]},
+    значения упорядочены по убыванию числа позиций.
+    """
+    facets = {}
+    rows = (
+        ProductParameter.objects.filter(
+            product_info__in=queryset.order_by().values("pk")
+        )
+        .values("parameter__name", "value")
+        .annotate(count=Count("product_info_id"))
+        .order_by("parameter__name", "-count", "value")
+    )
+    for row in rows:
+        facets.setdefault(row["parameter__name"], []).append(
+            {"value": row["value"], "count": row["count"]}
+        )
+    return facets
+
+
+@cache
+def has_trigram_extension(alias="default"):
+    """
+    Установлено ли в базе расширение pg_trgm.
+
+    Миграция 0024 пропускает его, если в сборке PostgreSQL расширения нет.
+    Проверяется один раз на процесс.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def catalog_suggestions(query, limit):
+    """
+    Подсказки для строки поиска: продукты, у которых название или модель
+    похожи на введенный текст.
+
+    Сходство считается по триграммам слов (pg_trgm), поэтому начало слова дает
+    расстояние 0, а опечатки - небольшое расстояние. Каждая колонка читается
+    KNN-просмотром GiST-индекса по возрастанию расстояния, строки одного
+    продукта из разных магазинов схлопываются. Без pg_trgm ищется подстрока
+    (icontains), совпадения с начала названия или модели идут первыми;
+    опечатки в этом режиме не находятся.
+    """
+    base = CatalogEntry.objects.filter(shop__status=True)
+    # Запас строк на дубли одного продукта в разных магазинах
+    fetch = limit * 5
+    columns = ("product_id", "product_name", "category_name", "distance")
+    if has_trigram_extension():
+        by_column = [
+            base.filter(**{f"{column}__trigram_word_similar": query})
+            .annotate(distance=TrigramWordDistance(query, column))
+            .order_by("distance")
+            .values_list(*columns)[:fetch]
+            for column in ("product_name", "model")
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SET LOCAL pg_trgm.word_similarity_threshold = %s",
+                [settings.PRODUCTS_SUGGEST_SIMILARITY],
+            )
+            rows = list(
+                by_column[0]
+                .union(by_column[1], all=True)
+                .order_by("distance", "product_name")
+            )
+    else:
+        rows = (
+            base.filter(Q(product_name__icontains=query) | Q(model__icontains=query))
+            .annotate(
+                distance=Case(
+                    When(
+                        Q(product_name__istartswith=query)
+                        | Q(model__istartswith=query),
+                        then=Value(0),
+                    ),
+                    default=Value(1),
+                )
+            )
+            .order_by("distance", "product_name")
+            .values_list(*columns)[:fetch]
+        )
+    suggestions = {}
+    for product_id, name, category, _ in rows:
+        if product_id not in suggestions:
+            suggestions[product_id] = {
+                "id": product_id,
+                "name": name,
+                "category": category,
+            }
+    return list(suggestions.values())[:limit]
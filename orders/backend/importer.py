@@ -0,0 +1,476 @@
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .caching import bump_catalog_version_on_commit
+from .catalog import refresh_catalog, sync_category_names
+from .models import (
+    Category,
+    ImportStagingItem,
+    Product,
+    Parameter,
+    ProductParameter,
+    ProductInfo,
+)
+
+IMPORT_MODES = ("full", "delta")
+
+
+def batched(iterable, size):
+    """Разбивает поток товаров на пачки по size элементов."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_categories(shop, categories):
+    """
+    Создаёт/обновляет категории и привязывает их к магазину.
+
+    Записываются только новые и переименованные категории, поэтому повторный
+    импорт того же прайса не сбрасывает кэш каталога.
+    """
+    objects = {
+        category["id"]: Category(id=category["id"], name=category["name"])
+        for category in categories
+    }
+    if not objects:
+        return
+    existing = dict(Category.objects.filter(id__in=objects).values_list("id", "name"))
+    changed = [
+        category
+        for category_id, category in objects.items()
+        if existing.get(category_id) != category.name
+    ]
+    if changed:
+        Category.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["name"],
+        )
+        sync_category_names([category.id for category in changed])
+        bump_catalog_version_on_commit()
+    Category.shops.through.objects.bulk_create(
+        [
+            Category.shops.through(category_id=category_id, shop_id=shop.id)
+            for category_id in objects
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def resolve_products(keys):
+    """Возвращает словарь {(name, category_id): product_id}, создавая недостающие."""
+    keys = set(keys)
+    names = {name for name, _ in keys}
+    categories = {category_id for _, category_id in keys}
+
+    def select():
+        return {
+            (name, category_id): product_id
+            for product_id, name, category_id in Product.objects.filter(
+                name__in=names, category_id__in=categories
+            ).values_list("id", "name", "category_id")
+            if (name, category_id) in keys
+        }
+
+    resolved = select()
+    missing = sorted(keys - resolved.keys())
+    if missing:
+        Product.objects.bulk_create(
+            [
+                Product(name=name, category_id=category_id)
+                for name, category_id in missing
+            ],
+            ignore_conflicts=True,
+        )
+        resolved = select()
+    return resolved
+
+
+def resolve_parameters(names, known):
+    """Дополняет кэш known {name: parameter_id} недостающими названиями параметров."""
+    missing = set(names) - known.keys()
+    if not missing:
+        return known
+    known.update(Parameter.objects.filter(name__in=missing).values_list("name", "id"))
+    missing = sorted(missing - known.keys())
+    if missing:
+        Parameter.objects.bulk_create(
+            [Parameter(name=name) for name in missing], ignore_conflicts=True
+        )
+        known.update(
+            Parameter.objects.filter(name__in=missing).values_list("name", "id")
+        )
+    return known
+
+
+def product_info_row(shop, item, products):
+    return ProductInfo(
+        product_id=products[(item["name"], item["category"])],
+        external_id=item["id"],
+        model=item["model"],
+        price=item["price"],
+        price_rrc=item["price_rrc"],
+        quantity=item["quantity"],
+        shop_id=shop.id,
+    )
+
+
+def parameter_rows(pairs, parameters):
+    return [
+        ProductParameter(
+            product_info_id=product_info_id,
+            parameter_id=parameters[name],
+            value=str(value),
+        )
+        for product_info_id, item in pairs
+        for name, value in item["parameters"].items()
+    ]
+
+
+def parameters_signature(items):
+    return hash(frozenset((name, str(value)) for name, value in items))
+
+
+def resolve_batch(batch, parameters):
+    products = resolve_products((item["name"], item["category"]) for item in batch)
+    resolve_parameters(
+        {name for item in batch for name in item["parameters"]}, parameters
+    )
+    return products
+
+
+def import_goods_batch(shop, batch, parameters, summary):
+    """Записывает одну пачку товаров: O(1) запросов независимо от размера пачки."""
+    products = resolve_batch(batch, parameters)
+    products_info = ProductInfo.objects.bulk_create(
+        [product_info_row(shop, item, products) for item in batch]
+    )
+    ProductParameter.objects.bulk_create(
+        parameter_rows(
+            (
+                (product_info.id, item)
+                for item, product_info in zip(batch, products_info)
+            ),
+            parameters,
+        )
+    )
+    refresh_catalog([product_info.id for product_info in products_info])
+    summary["inserted"] += len(batch)
+
+
+def load_catalog_state(shop):
+    """
+    Текущее состояние каталога магазина: {external_id: (id, поля, подпись параметров)}.
+
+    Параметры хранятся в виде хэша, чтобы состояние крупного каталога занимало
+    немного памяти. Повторные позиции с тем же external_id возвращаются отдельно
+    и удаляются при импорте.
+    """
+    signatures = {}
+    current_id, current = None, []
+    for product_info_id, name, value in (
+        ProductParameter.objects.filter(product_info__shop_id=shop.id)
+        .order_by("product_info_id")
+        .values_list("product_info_id", "parameter__name", "value")
+        .iterator(chunk_size=settings.IMPORT_BATCH_SIZE)
+    ):
+        if product_info_id != current_id:
+            if current_id is not None:
+                signatures[current_id] = parameters_signature(current)
+            current_id, current = product_info_id, []
+        current.append((name, value))
+    if current_id is not None:
+        signatures[current_id] = parameters_signature(current)
+
+    state, duplicates = {}, []
+    empty = parameters_signature(())
+    for row in (
+        ProductInfo.objects.filter(shop_id=shop.id)
+        .order_by("id")
+        .values_list(
+            "id",
+            "external_id",
+            "product_id",
+            "model",
+            "price",
+            "price_rrc",
+            "quantity",
+        )
+        .iterator(chunk_size=settings.IMPORT_BATCH_SIZE)
+    ):
+        if row[1] in state:
+            duplicates.append(row[0])
+            continue
+        state[row[1]] = (row[0], row[2:], signatures.get(row[0], empty))
+    return state, duplicates
+
+
+def apply_delta_batch(shop, batch, parameters, state, summary):
+    """Сравнивает пачку товаров с состоянием каталога и пишет только изменения."""
+    products = resolve_batch(batch, parameters)
+    inserts, updates, replaced = [], [], []
+    for item in batch:
+        row = product_info_row(shop, item, products)
+        current = state.pop(item["id"], None)
+        if current is None:
+            inserts.append((row, item))
+            continue
+        row.id, fields, signature = current
+        if fields != (
+            row.product_id,
+            row.model,
+            row.price,
+            row.price_rrc,
+            row.quantity,
+        ):
+            updates.append(row)
+        if signature != parameters_signature(item["parameters"].items()):
+            replaced.append((row.id, item))
+    if inserts:
+        ProductInfo.objects.bulk_create([row for row, _ in inserts])
+    if updates:
+        ProductInfo.objects.bulk_update(
+            updates, ["product", "model", "price", "price_rrc", "quantity"]
+        )
+    if replaced:
+        ProductParameter.objects.filter(
+            product_info_id__in=[product_info_id for product_info_id, _ in replaced]
+        ).delete()
+    pairs = [(row.id, item) for row, item in inserts] + replaced
+    if pairs:
+        ProductParameter.objects.bulk_create(parameter_rows(pairs, parameters))
+    changed = {row.id for row in updates} | {row_id for row_id, _ in replaced}
+    refresh_catalog([row.id for row, _ in inserts] + list(changed))
+    summary["inserted"] += len(inserts)
+    summary["updated"] += len(changed)
+    summary["unchanged"] += len(batch) - len(inserts) - len(changed)
+
+
+def delete_product_infos(ids, batch_size):
+    deleted = 0
+    for batch in batched(ids, batch_size):
+        deleted += (
+            ProductInfo.objects.filter(id__in=batch)
+            .delete()[1]
+            .get(ProductInfo._meta.label, 0)
+        )
+    return deleted
+
+
+def import_mode(mode=None):
+    """Режим импорта: переданный или settings.IMPORT_MODE."""
+    mode = mode or settings.IMPORT_MODE
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Неизвестный режим импорта: {mode}")
+    return mode
+
+
+def import_price_list(
+    shop, categories, goods, batch_size=None, mode=None, progress=None
+):
+    """
+    Пакетный импорт прайса магазина.
+
+    Категории, продукты и названия параметров разрешаются множественными
+    запросами, позиции и их параметры пишутся пачками по batch_size
+    (по умолчанию settings.IMPORT_BATCH_SIZE).
+
+    В режиме "full" каталог магазина удаляется и записывается заново. В режиме
+    "delta" (по умолчанию settings.IMPORT_MODE) входящие товары сравниваются с
+    текущим каталогом по external_id и применяются только вставки, изменения и
+    удаления. Возвращает сводку изменений и скорость импорта в строках в секунду.
+
+    progress - необязательная функция, которая вызывается после каждой пачки с
+    числом обработанных товаров.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    mode = import_mode(mode)
+    started = time.monotonic()
+    summary = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    goods_count = 0
+    batches = 0
+    parameters = {}
+    with transaction.atomic():
+        import_categories(shop, categories)
+        if mode == "full":
+            summary["deleted"] = (
+                ProductInfo.objects.filter(shop_id=shop.id)
+                .delete()[1]
+                .get(ProductInfo._meta.label, 0)
+            )
+        else:
+            state, duplicates = load_catalog_state(shop)
+        for batch in batched(goods, batch_size):
+            if mode == "full":
+                import_goods_batch(shop, batch, parameters, summary)
+            else:
+                apply_delta_batch(shop, batch, parameters, state, summary)
+            goods_count += len(batch)
+            batches += 1
+            if progress is not None:
+                progress(goods_count)
+        if mode == "delta":
+            summary["deleted"] = delete_product_infos(
+                duplicates + [current[0] for current in state.values()], batch_size
+            )
+        if summary["inserted"] or summary["updated"] or summary["deleted"]:
+            bump_catalog_version_on_commit(shop.id)
+    seconds = time.monotonic() - started
+    return {
+        "mode": mode,
+        "goods": goods_count,
+        "batches": batches,
+        **summary,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(goods_count / seconds) if seconds else goods_count,
+    }
+
+
+def stage_goods(import_key, goods, batch_size=None):
+    """
+    Записывает часть прайса в промежуточную таблицу для параллельного импорта.
+
+    Продукты и параметры разрешаются так же, как при обычном импорте: уникальные
+    ограничения и ON CONFLICT DO NOTHING делают это безопасным при одновременной
+    работе нескольких воркеров.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    parameters = {}
+    staged = 0
+    for batch in batched(goods, batch_size):
+        products = resolve_batch(batch, parameters)
+        ImportStagingItem.objects.bulk_create(
+            [
+                ImportStagingItem(
+                    import_key=import_key,
+                    external_id=item["id"],
+                    product_id=products[(item["name"], item["category"])],
+                    model=item["model"],
+                    price=item["price"],
+                    price_rrc=item["price_rrc"],
+                    quantity=item["quantity"],
+                    parameters={
+                        str(parameters[name]): str(value)
+                        for name, value in item["parameters"].items()
+                    },
+                )
+                for item in batch
+            ]
+        )
+        staged += len(batch)
+    return staged
+
+
+def merge_staged_goods(shop, import_key, mode=None):
+    """
+    Переносит промежуточные строки импорта в каталог магазина одной транзакцией.
+
+    В режиме "delta" удаляет позиции, которых нет в прайсе, обновляет
+    изменившиеся, добавляет новые и заменяет изменившиеся наборы параметров.
+    В режиме "full" каталог магазина сначала удаляется целиком, и все строки
+    добавляются заново. Результат тот же, что у последовательного импорта в
+    том же режиме.
+    """
+    mode = import_mode(mode)
+    started = time.monotonic()
+    staged = ImportStagingItem.objects.filter(import_key=import_key)
+    product_info = ProductInfo._meta.db_table
+    product_parameter = ProductParameter._meta.db_table
+    staging = ImportStagingItem._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        goods_count = staged.count()
+        current = ProductInfo.objects.filter(shop_id=shop.id)
+        if mode == "delta":
+            current = current.exclude(
+                Exists(staged.filter(external_id=OuterRef("external_id")))
+            )
+        deleted = current.delete()[1].get(ProductInfo._meta.label, 0)
+        cursor.execute(
+            f"""
+            UPDATE {product_info} AS pi
+            SET product_id = s.product_id, model = s.model, price = s.price,
+                price_rrc = s.price_rrc, quantity = s.quantity
+            FROM {staging} AS s
+            WHERE s.import_key = %s AND pi.shop_id = %s
+              AND pi.external_id = s.external_id
+              AND (pi.product_id, pi.model, pi.price, pi.price_rrc, pi.quantity)
+                  IS DISTINCT FROM
+                  (s.product_id, s.model, s.price, s.price_rrc, s.quantity)
+            RETURNING pi.id
+            """,
+            [import_key, shop.id],
+        )
+        updated = {row[0] for row in cursor.fetchall()}
+        cursor.execute(
+            f"""
+            INSERT INTO {product_info}
+                (product_id, external_id, model, price, price_rrc, quantity, shop_id)
+            SELECT s.product_id, s.external_id, s.model, s.price, s.price_rrc,
+                   s.quantity, %s
+            FROM {staging} AS s
+            WHERE s.import_key = %s AND NOT EXISTS (
+                SELECT 1 FROM {product_info} AS pi
+                WHERE pi.shop_id = %s AND pi.external_id = s.external_id
+            )
+            RETURNING id
+            """,
+            [shop.id, import_key, shop.id],
+        )
+        inserted = {row[0] for row in cursor.fetchall()}
+        cursor.execute(
+            f"""
+            CREATE TEMPORARY TABLE import_changed_parameters AS
+            SELECT pi.id AS product_info_id, s.parameters
+            FROM {product_info} AS pi
+            JOIN {staging} AS s
+              ON s.import_key = %s AND pi.external_id = s.external_id
+            WHERE pi.shop_id = %s AND s.parameters IS DISTINCT FROM COALESCE(
+                (SELECT jsonb_object_agg(pp.parameter_id::text, pp.value)
+                 FROM {product_parameter} AS pp
+                 WHERE pp.product_info_id = pi.id),
+                '{{}}'::jsonb
+            )
+            """,
+            [import_key, shop.id],
+        )
+        cursor.execute(f"""
+            DELETE FROM {product_parameter} AS pp
+            USING import_changed_parameters AS c
+            WHERE pp.product_info_id = c.product_info_id
+            """)
+        cursor.execute(f"""
+            INSERT INTO {product_parameter} (product_info_id, parameter_id, value)
+            SELECT c.product_info_id, p.key::bigint, p.value
+            FROM import_changed_parameters AS c,
+                 jsonb_each_text(c.parameters) AS p
+            """)
+        cursor.execute("SELECT product_info_id FROM import_changed_parameters")
+        updated |= {row[0] for row in cursor.fetchall()}
+        cursor.execute("DROP TABLE import_changed_parameters")
+        staged.delete()
+        refresh_catalog(inserted | updated)
+        if inserted or updated or deleted:
+            bump_catalog_version_on_commit(shop.id)
+    updated -= inserted
+    seconds = time.monotonic() - started
+    return {
+        "mode": mode,
+        "goods": goods_count,
+        "batches": 1,
+        "inserted": len(inserted),
+        "updated": len(updated),
+        "deleted": deleted,
+        "unchanged": goods_count - len(inserted) - len(updated),
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(goods_count / seconds) if seconds else goods_count,
+    }
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from backend.benchmarks import benchmark_catalog_serializers, benchmark_database
+
+COLUMNS = (
+    ("rows", ">9"),
+    ("drf_seconds", ">13"),
+    ("fast_seconds", ">14"),
+    ("speedup", ">9"),
+    ("identical", ">11"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер сериализации каталога: ProductInfoSerializer против быстрого пути "
+        "по витрине, во временной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[10000],
+            help="Число позиций, например: --rows 1000 10000",
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Не удалять тестовую базу после замера",
+        )
+
+    def handle(self, *args, **options):
+        # Замер идет в отдельной тестовой базе с отдельным кэшем
+        with benchmark_database(options["keepdb"]):
+            self.stdout.write("".join(f"{name:{fmt}}" for name, fmt in COLUMNS))
+            for rows_count in options["rows"]:
+                result = benchmark_catalog_serializers(
+                    rows_count, options["seed"], options["repeat"]
+                )
+                self.stdout.write(
+                    "".join(f"{str(result[name]):{fmt}}" for name, fmt in COLUMNS)
+                )
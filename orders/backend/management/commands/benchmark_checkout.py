@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from backend.benchmarks import benchmark_checkout, benchmark_database
+
+COLUMNS = (
+    ("buyers", ">8"),
+    ("stock", ">7"),
+    ("succeeded", ">11"),
+    ("failed", ">8"),
+    ("remaining", ">11"),
+    ("oversold", ">10"),
+    ("seconds", ">9"),
+    ("checkouts_per_sec", ">19"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочная проверка оформления заказов: параллельная покупка одного "
+        "товара без перепродажи, во временной тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=500)
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=None,
+            help="Остаток товара, по умолчанию половина спроса",
+        )
+        parser.add_argument("--quantity", type=int, default=1)
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Не удалять тестовую базу после замера",
+        )
+
+    def handle(self, *args, **options):
+        stock = options["stock"]
+        if stock is None:
+            stock = options["buyers"] * options["quantity"] // 2
+        # Замер идет в отдельной тестовой базе с отдельным кэшем
+        with benchmark_database(options["keepdb"]):
+            result = benchmark_checkout(
+                options["buyers"], stock, options["quantity"], options["workers"]
+            )
+            self.stdout.write("".join(f"{name:{fmt}}" for name, fmt in COLUMNS))
+            self.stdout.write(
+                "".join(f"{str(result[name]):{fmt}}" for name, fmt in COLUMNS)
+            )
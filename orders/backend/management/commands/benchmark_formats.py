@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from backend.benchmarks import PRICE_LIST_WRITERS, benchmark_formats
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость разбора синтетического прайса в разных форматах"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--goods", type=int, default=10000)
+        parser.add_argument(
+            "--formats", nargs="+", choices=list(PRICE_LIST_WRITERS), default=None
+        )
+
+    def handle(self, *args, **options):
+        formats = options["formats"] or list(PRICE_LIST_WRITERS)
+        self.stdout.write(
+            f"{'format':<8}{'goods':>10}{'MB':>10}{'seconds':>10}{'goods/s':>12}"
+        )
+        for result in benchmark_formats(options["goods"], formats):
+            self.stdout.write(
+                f"{result['format']:<8}{result['goods']:>10}"
+                f"{result['bytes'] / 1024 ** 2:>10.1f}{result['seconds']:>10}"
+                f"{result['goods_per_sec']:>12}"
+            )
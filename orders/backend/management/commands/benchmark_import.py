@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from backend.benchmarks import PRICE_LIST_WRITERS, benchmark_database, benchmark_import
+from backend.importer import IMPORT_MODES
+
+COLUMNS = (
+    ("run", "<8"),
+    ("goods", ">9"),
+    ("seconds", ">9"),
+    ("queries", ">9"),
+    ("rows_per_sec", ">13"),
+    ("inserted", ">9"),
+    ("updated", ">9"),
+    ("unchanged", ">10"),
+    ("peak_rss_mb", ">12"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер сквозного импорта синтетического прайса (get_import) во временной "
+        "тестовой базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--goods",
+            type=int,
+            nargs="+",
+            default=[1000],
+            help="Размеры прайса, например: --goods 1000 100000 1000000",
+        )
+        parser.add_argument(
+            "--format", choices=list(PRICE_LIST_WRITERS), default="yaml"
+        )
+        parser.add_argument("--mode", choices=IMPORT_MODES, default=None)
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--spool-dir", default=None, help="Каталог для файлов прайсов"
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Не удалять тестовую базу после замера",
+        )
+
+    def handle(self, *args, **options):
+        # Замер идет в отдельной тестовой базе с отдельным кэшем
+        with benchmark_database(options["keepdb"]):
+            self.stdout.write("".join(f"{name:{fmt}}" for name, fmt in COLUMNS))
+            for goods_count in options["goods"]:
+                for result in benchmark_import(
+                    goods_count,
+                    options["format"],
+                    options["spool_dir"],
+                    options["seed"],
+                    options["batch_size"],
+                    options["mode"],
+                ):
+                    self.stdout.write(
+                        "".join(f"{result[name]:{fmt}}" for name, fmt in COLUMNS)
+                    )
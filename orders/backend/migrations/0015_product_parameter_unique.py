@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:26
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    # Перед созданием уникальных ограничений сливаем дубликаты продуктов и
+    # параметров, ссылки переносим на запись с наименьшим ID
+    Parameter = apps.get_model("backend", "Parameter")
+    Product = apps.get_model("backend", "Product")
+    ProductParameter = apps.get_model("backend", "ProductParameter")
+    ProductInfo = apps.get_model("backend", "ProductInfo")
+    AvatarProduct = apps.get_model("backend", "AvatarProduct")
+
+    duplicates = (
+        Parameter.objects.values("name")
+        .annotate(keep_id=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        others = Parameter.objects.filter(name=row["name"]).exclude(id=row["keep_id"])
+        ProductParameter.objects.filter(
+            parameter__in=others,
+            product_info__in=ProductParameter.objects.filter(
+                parameter_id=row["keep_id"]
+            ).values("product_info"),
+        ).delete()
+        ProductParameter.objects.filter(parameter__in=others).update(
+            parameter_id=row["keep_id"]
+        )
+        others.delete()
+
+    duplicates = (
+        Product.objects.values("name", "category")
+        .annotate(keep_id=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        others = Product.objects.filter(
+            name=row["name"], category_id=row["category"]
+        ).exclude(id=row["keep_id"])
+        for product_info in ProductInfo.objects.filter(product__in=others):
+            if ProductInfo.objects.filter(
+                product_id=row["keep_id"],
+                shop_id=product_info.shop_id,
+                external_id=product_info.external_id,
+            ).exists():
+                product_info.delete()
+            else:
+                product_info.product_id = row["keep_id"]
+                product_info.save(update_fields=["product"])
+        if AvatarProduct.objects.filter(product_id=row["keep_id"]).exists():
+            AvatarProduct.objects.filter(product__in=others).delete()
+        else:
+            avatar = AvatarProduct.objects.filter(product__in=others).first()
+            if avatar:
+                avatar.product_id = row["keep_id"]
+                avatar.save(update_fields=["product"])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0014_avatarproduct_avataruser"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="parameter",
+            constraint=models.UniqueConstraint(
+                fields=("name",), name="unique_parameter"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="product",
+            constraint=models.UniqueConstraint(
+                fields=("name", "category"), name="unique_product"
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0015_product_parameter_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shop",
+            name="feed_etag",
+            field=models.CharField(
+                blank=True, max_length=255, verbose_name="ETag прайса"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shop",
+            name="feed_hash",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="Хэш прайса"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shop",
+            name="feed_last_modified",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="Last-Modified прайса"
+            ),
+        ),
+        migrations.AddField(
+            model_name="shop",
+            name="feed_url",
+            field=models.URLField(
+                blank=True, max_length=500, verbose_name="URL последнего импорта"
+            ),
+        ),
+        migrations.CreateModel(
+            name="ImportSkip",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.URLField(max_length=500, verbose_name="URL прайса")),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("not_modified", "Прайс не изменился (304)"),
+                            ("same_hash", "Совпадает хэш содержимого"),
+                        ],
+                        max_length=15,
+                        verbose_name="Причина",
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Загружено байт"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Когда"),
+                ),
+                (
+                    "shop",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_skips",
+                        to="backend.shop",
+                        verbose_name="Магазин",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Пропущенный импорт",
+                "verbose_name_plural": "Пропущенные импорты",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0016_shop_feed_state_importskip"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "url",
+                    models.URLField(
+                        blank=True, max_length=500, verbose_name="URL прайса"
+                    ),
+                ),
+                (
+                    "task_id",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="ID задачи"
+                    ),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("queued", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("done", "Завершен"),
+                            ("skipped", "Пропущен"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="queued",
+                        max_length=15,
+                        verbose_name="Состояние",
+                    ),
+                ),
+                (
+                    "goods_processed",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Обработано товаров"
+                    ),
+                ),
+                (
+                    "bytes_total",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Размер прайса"
+                    ),
+                ),
+                (
+                    "bytes_processed",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Обработано байт"
+                    ),
+                ),
+                (
+                    "inserted",
+                    models.PositiveIntegerField(default=0, verbose_name="Добавлено"),
+                ),
+                (
+                    "updated",
+                    models.PositiveIntegerField(default=0, verbose_name="Изменено"),
+                ),
+                (
+                    "deleted",
+                    models.PositiveIntegerField(default=0, verbose_name="Удалено"),
+                ),
+                (
+                    "unchanged",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Без изменений"
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Ошибка")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создан"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Начат"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Завершен"
+                    ),
+                ),
+                (
+                    "shop",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="import_jobs",
+                        to="backend.shop",
+                        verbose_name="Магазин",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задача импорта",
+                "verbose_name_plural": "Задачи импорта",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0017_importjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportStagingItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "import_key",
+                    models.CharField(max_length=36, verbose_name="Ключ импорта"),
+                ),
+                ("external_id", models.PositiveIntegerField(verbose_name="Внешний ИД")),
+                (
+                    "model",
+                    models.CharField(blank=True, max_length=80, verbose_name="Модель"),
+                ),
+                ("quantity", models.PositiveIntegerField(verbose_name="Количество")),
+                ("price", models.PositiveIntegerField(verbose_name="Цена")),
+                (
+                    "price_rrc",
+                    models.PositiveIntegerField(verbose_name="Рекомендуемая цена"),
+                ),
+                (
+                    "parameters",
+                    models.JSONField(default=dict, verbose_name="Параметры"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staging_items",
+                        to="backend.product",
+                        verbose_name="Продукт",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Строка параллельного импорта",
+                "verbose_name_plural": "Строки параллельного импорта",
+                "indexes": [
+                    models.Index(
+                        fields=["import_key", "external_id"],
+                        name="staging_key_external_id",
+                    )
+                ],
+            },
+        ),
+    ]
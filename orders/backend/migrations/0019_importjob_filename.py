@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0018_importstagingitem"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="filename",
+            field=models.CharField(
+                blank=True, max_length=255, verbose_name="Загруженный файл"
+            ),
+        ),
+    ]
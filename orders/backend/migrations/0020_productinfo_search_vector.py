@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_search_vectors(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE backend_productinfo AS pi
+            SET search_vector =
+                setweight(to_tsvector(%(config)s::regconfig, p.name), 'A')
+                || setweight(to_tsvector(
+                    %(config)s::regconfig, translate(pi.model, '/', ' ')
+                ), 'B')
+                || setweight(to_tsvector(%(config)s::regconfig, coalesce(
+                    (SELECT string_agg(pp.value, ' ')
+                     FROM backend_productparameter AS pp
+                     WHERE pp.product_info_id = pi.id),
+                    ''
+                )), 'C')
+            FROM backend_product AS p
+            WHERE p.id = pi.product_id
+            """,
+            {"config": settings.PRODUCTS_SEARCH_CONFIG},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0019_importjob_filename"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productinfo",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="Поисковый вектор"
+            ),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="productinfo",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="product_info_search"
+            ),
+        ),
+    ]
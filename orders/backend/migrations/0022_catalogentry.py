@@ -0,0 +1,116 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_catalog(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO backend_catalogentry (
+                product_info_id, shop_id, shop_name, category_id, category_name,
+                product_id, product_name, model, external_id, quantity, price,
+                price_rrc, parameters
+            )
+            SELECT pi.id, s.id, s.name, c.id, c.name, p.id, p.name, pi.model,
+                   pi.external_id, pi.quantity, pi.price, pi.price_rrc,
+                   COALESCE(
+                       (SELECT jsonb_agg(
+                            jsonb_build_array(pa.name, pp.value)
+                            ORDER BY pa.name DESC
+                        )
+                        FROM backend_productparameter AS pp
+                        JOIN backend_parameter AS pa ON pa.id = pp.parameter_id
+                        WHERE pp.product_info_id = pi.id),
+                       '[]'::jsonb
+                   )
+            FROM backend_productinfo AS pi
+            JOIN backend_shop AS s ON s.id = pi.shop_id
+            JOIN backend_product AS p ON p.id = pi.product_id
+            JOIN backend_category AS c ON c.id = p.category_id
+            """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0021_productparameter_value_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogEntry",
+            fields=[
+                (
+                    "product_info",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="catalog_entry",
+                        serialize=False,
+                        to="backend.productinfo",
+                        verbose_name="Информация о продукте",
+                    ),
+                ),
+                (
+                    "shop_name",
+                    models.CharField(max_length=100, verbose_name="Название магазина"),
+                ),
+                (
+                    "category_name",
+                    models.CharField(max_length=100, verbose_name="Название категории"),
+                ),
+                (
+                    "product_name",
+                    models.CharField(max_length=100, verbose_name="Название продукта"),
+                ),
+                (
+                    "model",
+                    models.CharField(blank=True, max_length=80, verbose_name="Модель"),
+                ),
+                ("external_id", models.PositiveIntegerField(verbose_name="Внешний ИД")),
+                ("quantity", models.PositiveIntegerField(verbose_name="Количество")),
+                ("price", models.PositiveIntegerField(verbose_name="Цена")),
+                (
+                    "price_rrc",
+                    models.PositiveIntegerField(verbose_name="Рекомендуемая цена"),
+                ),
+                (
+                    "parameters",
+                    models.JSONField(default=list, verbose_name="Параметры"),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="backend.category",
+                        verbose_name="Категория",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="backend.product",
+                        verbose_name="Продукт",
+                    ),
+                ),
+                (
+                    "shop",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="catalog_entries",
+                        to="backend.shop",
+                        verbose_name="Магазин",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Строка витрины каталога",
+                "verbose_name_plural": "Витрина каталога",
+            },
+        ),
+        migrations.RunPython(fill_catalog, migrations.RunPython.noop),
+    ]
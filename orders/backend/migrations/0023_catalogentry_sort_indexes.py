@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0022_catalogentry"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(fields=["price", "product_info"], name="catalog_price"),
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                fields=["price_rrc", "product_info"], name="catalog_price_rrc"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogentry",
+            index=models.Index(
+                fields=["quantity", "product_info"], name="catalog_quantity"
+            ),
+        ),
+    ]
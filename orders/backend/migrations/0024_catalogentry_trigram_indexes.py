@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+TRIGRAM_INDEXES = [
+    django.contrib.postgres.indexes.GistIndex(
+        fields=["product_name"],
+        name="catalog_product_name_trgm",
+        opclasses=["gist_trgm_ops"],
+    ),
+    django.contrib.postgres.indexes.GistIndex(
+        fields=["model"], name="catalog_model_trgm", opclasses=["gist_trgm_ops"]
+    ),
+]
+
+
+def trigram_available(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm входит в contrib; сборки PostgreSQL без contrib пропускают
+    # индексы, подсказки поиска в такой базе недоступны
+    if not trigram_available(schema_editor):
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    model = apps.get_model("backend", "CatalogEntry")
+    for index in TRIGRAM_INDEXES:
+        schema_editor.add_index(model, index)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for index in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0023_catalogentry_sort_indexes"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="catalogentry", index=index)
+                for index in TRIGRAM_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_trigram_indexes, drop_trigram_indexes)
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+def fill_order_totals(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        # Цены существующих позиций фиксируются по текущему прайсу
+        cursor.execute("""
+            UPDATE backend_orderitem AS oi
+            SET price = pi.price, shop_id = COALESCE(oi.shop_id, pi.shop_id)
+            FROM backend_productinfo AS pi
+            WHERE pi.id = oi.product_info_id
+            """)
+        cursor.execute("""
+            UPDATE backend_order AS o
+            SET total_sum = totals.total_sum, items_count = totals.items_count
+            FROM (
+                SELECT order_id, SUM(quantity::bigint * price) AS total_sum,
+                       COUNT(*) AS items_count
+                FROM backend_orderitem
+                GROUP BY order_id
+            ) AS totals
+            WHERE totals.order_id = o.id
+            """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0024_catalogentry_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="items_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Число позиций"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total_sum",
+            field=models.PositiveBigIntegerField(
+                default=0, editable=False, verbose_name="Сумма заказа"
+            ),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="price",
+            field=models.PositiveIntegerField(default=0, verbose_name="Цена"),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
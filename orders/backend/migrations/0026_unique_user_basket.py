@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+def merge_duplicate_baskets(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        # Лишние корзины пользователя сливаются в самую раннюю: одинаковые
+        # позиции складываются, цена берется последняя зафиксированная
+        cursor.execute("""
+            CREATE TEMPORARY TABLE duplicate_basket ON COMMIT DROP AS
+            SELECT id, keep_id
+            FROM (
+                SELECT id, MIN(id) OVER (PARTITION BY user_id) AS keep_id
+                FROM backend_order
+                WHERE status = 'basket'
+            ) AS basket
+            WHERE id <> keep_id
+            """)
+        cursor.execute("""
+            INSERT INTO backend_orderitem (
+                order_id, product_info_id, shop_id, quantity, price
+            )
+            SELECT d.keep_id, oi.product_info_id, MAX(oi.shop_id),
+                   SUM(oi.quantity), MAX(oi.price)
+            FROM backend_orderitem AS oi
+            JOIN duplicate_basket AS d ON d.id = oi.order_id
+            GROUP BY d.keep_id, oi.product_info_id
+            ON CONFLICT (order_id, product_info_id) DO UPDATE
+            SET quantity = backend_orderitem.quantity + EXCLUDED.quantity
+            """)
+        cursor.execute("""
+            DELETE FROM backend_orderitem
+            WHERE order_id IN (SELECT id FROM duplicate_basket)
+            """)
+        cursor.execute("""
+            DELETE FROM backend_order
+            WHERE id IN (SELECT id FROM duplicate_basket)
+            """)
+        cursor.execute("""
+            UPDATE backend_order AS o
+            SET total_sum = COALESCE(totals.total_sum, 0),
+                items_count = COALESCE(totals.items_count, 0)
+            FROM (SELECT DISTINCT keep_id FROM duplicate_basket) AS kept
+            LEFT JOIN (
+                SELECT order_id, SUM(quantity::bigint * price) AS total_sum,
+                       COUNT(*) AS items_count
+                FROM backend_orderitem
+                GROUP BY order_id
+            ) AS totals ON totals.order_id = kept.keep_id
+            WHERE o.id = kept.keep_id
+            """)
+        # Отложенные проверки внешних ключей выполняются сразу, иначе индекс
+        # ограничения не создать в той же транзакции
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0025_order_totals"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_baskets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="order",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "basket")),
+                fields=("user",),
+                name="unique_user_basket",
+            ),
+        ),
+    ]
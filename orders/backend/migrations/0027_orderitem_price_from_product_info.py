@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0026_unique_user_basket"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="orderitem",
+            name="price",
+            field=models.PositiveIntegerField(blank=True, verbose_name="Цена"),
+        ),
+    ]
@@ -7,6 +7,9 @@ from django.contrib.auth.models import (
 )
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.contrib.auth.hashers import make_password
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.cache import cache
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django_rest_passwordreset.tokens import get_token_generator
@@ -29,6 +32,19 @@ STATE_CHOICES = (
     ("canceled", "Отменен"),
 )
 
+IMPORT_SKIP_CHOICES = (
+    ("not_modified", "Прайс не изменился (304)"),
+    ("same_hash", "Совпадает хэш содержимого"),
+)
+
+IMPORT_JOB_STATE_CHOICES = (
+    ("queued", "В очереди"),
+    ("running", "Выполняется"),
+    ("done", "Завершен"),
+    ("skipped", "Пропущен"),
+    ("failed", "Ошибка"),
+)
+
 # Create your models here.
 
 
@@ -160,6 +176,14 @@ class Shop(models.Model):
         on_delete=models.CASCADE,
     )
     status = models.BooleanField(verbose_name="Статус", default=True)
+    feed_url = models.URLField(
+        verbose_name="URL последнего импорта", max_length=500, blank=True
+    )
+    feed_etag = models.CharField(verbose_name="ETag прайса", max_length=255, blank=True)
+    feed_last_modified = models.CharField(
+        verbose_name="Last-Modified прайса", max_length=64, blank=True
+    )
+    feed_hash = models.CharField(verbose_name="Хэш прайса", max_length=64, blank=True)
 
     def __str__(self):
         return self.name
@@ -170,6 +194,145 @@ class Shop(models.Model):
         verbose_name_plural = "Магазины"
 
 
+class ImportSkip(models.Model):
+    objects = models.manager.Manager()
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name="Магазин",
+        related_name="import_skips",
+        on_delete=models.CASCADE,
+    )
+    url = models.URLField(verbose_name="URL прайса", max_length=500)
+    reason = models.CharField(
+        verbose_name="Причина", choices=IMPORT_SKIP_CHOICES, max_length=15
+    )
+    size = models.PositiveBigIntegerField(verbose_name="Загружено байт", default=0)
+    created_at = models.DateTimeField(verbose_name="Когда", auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.shop} {self.reason} {self.created_at}"
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Пропущенный импорт"
+        verbose_name_plural = "Пропущенные импорты"
+
+
+class ImportJob(models.Model):
+    objects = models.manager.Manager()
+    user = models.ForeignKey(
+        CustomUser,
+        verbose_name="Пользователь",
+        related_name="import_jobs",
+        on_delete=models.CASCADE,
+    )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name="Магазин",
+        related_name="import_jobs",
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    url = models.URLField(verbose_name="URL прайса", max_length=500, blank=True)
+    filename = models.CharField(
+        verbose_name="Загруженный файл", max_length=255, blank=True
+    )
+    task_id = models.CharField(verbose_name="ID задачи", max_length=255, blank=True)
+    state = models.CharField(
+        verbose_name="Состояние",
+        choices=IMPORT_JOB_STATE_CHOICES,
+        max_length=15,
+        default="queued",
+    )
+    goods_processed = models.PositiveIntegerField(
+        verbose_name="Обработано товаров", default=0
+    )
+    bytes_total = models.PositiveBigIntegerField(
+        verbose_name="Размер прайса", default=0
+    )
+    bytes_processed = models.PositiveBigIntegerField(
+        verbose_name="Обработано байт", default=0
+    )
+    inserted = models.PositiveIntegerField(verbose_name="Добавлено", default=0)
+    updated = models.PositiveIntegerField(verbose_name="Изменено", default=0)
+    deleted = models.PositiveIntegerField(verbose_name="Удалено", default=0)
+    unchanged = models.PositiveIntegerField(verbose_name="Без изменений", default=0)
+    error = models.TextField(verbose_name="Ошибка", blank=True)
+    created_at = models.DateTimeField(verbose_name="Создан", auto_now_add=True)
+    started_at = models.DateTimeField(verbose_name="Начат", blank=True, null=True)
+    finished_at = models.DateTimeField(verbose_name="Завершен", blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.user} {self.state} {self.created_at}"
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Задача импорта"
+        verbose_name_plural = "Задачи импорта"
+
+    @property
+    def progress_key(self):
+        return f"import_job:{self.id}:progress"
+
+    def set_progress(self, goods_processed, bytes_processed):
+        # Импорт идет в одной транзакции, поэтому текущий прогресс держим в кэше,
+        # а в базу он попадает при завершении задачи
+        cache.set(
+            self.progress_key,
+            (goods_processed, bytes_processed),
+            timeout=60 * 60 * 24,
+        )
+
+    def load_progress(self):
+        if self.state == "running":
+            progress = cache.get(self.progress_key)
+            if progress:
+                self.goods_processed, self.bytes_processed = progress
+        return self
+
+    def start(self, bytes_total=0):
+        self.state = "running"
+        self.bytes_total = bytes_total
+        self.started_at = timezone.now()
+        self.save(update_fields=["state", "bytes_total", "started_at"])
+
+    def finish(self, state, stats=None, error=""):
+        # Сохраняются только заданные здесь поля: части параллельного импорта
+        # в это время увеличивают goods_processed через F()
+        fields = ["state", "error", "finished_at"]
+        self.state = state
+        self.error = error
+        self.finished_at = timezone.now()
+        if stats:
+            self.goods_processed = stats["goods"]
+            self.bytes_processed = self.bytes_total
+            fields += ["goods_processed", "bytes_processed"]
+            for field in ("inserted", "updated", "deleted", "unchanged"):
+                setattr(self, field, stats[field])
+                fields.append(field)
+        self.save(update_fields=fields)
+        cache.delete(self.progress_key)
+
+    @property
+    def goods_per_sec(self):
+        if not self.started_at:
+            return 0
+        seconds = (
+            (self.finished_at or timezone.now()) - self.started_at
+        ).total_seconds()
+        return round(self.goods_processed / seconds, 1) if seconds > 0 else 0
+
+    @property
+    def eta(self):
+        """Оценка оставшегося времени в секундах по доле прочитанного файла."""
+        if self.state != "running" or not self.bytes_total or not self.bytes_processed:
+            return None
+        seconds = (timezone.now() - self.started_at).total_seconds()
+        remaining = self.bytes_total - self.bytes_processed
+        return round(max(remaining, 0) * seconds / self.bytes_processed, 1)
+
+
 class Category(models.Model):
     objects = models.manager.Manager()
     shops = models.ManyToManyField(
@@ -204,6 +367,9 @@ class Product(models.Model):
         ordering = ["-name"]
         verbose_name = "Продукт"
         verbose_name_plural = "Продукты"
+        constraints = [
+            models.UniqueConstraint(fields=["name", "category"], name="unique_product")
+        ]
 
 
 class ProductInfo(models.Model):
@@ -227,6 +393,10 @@ class ProductInfo(models.Model):
     quantity = models.PositiveIntegerField(verbose_name="Количество")
     price = models.PositiveIntegerField(verbose_name="Цена")
     price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая цена")
+    # Заполняется при импорте и правках позиций, см. catalog.refresh_search_vectors()
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор", null=True, editable=False
+    )
 
     def __str__(self):
         return self.product.name
@@ -239,6 +409,36 @@ class ProductInfo(models.Model):
                 fields=["product", "shop", "external_id"], name="unique_product_info"
             )
         ]
+        indexes = [GinIndex(fields=["search_vector"], name="product_info_search")]
+
+
+class ImportStagingItem(models.Model):
+    objects = models.manager.Manager()
+    import_key = models.CharField(verbose_name="Ключ импорта", max_length=36)
+    external_id = models.PositiveIntegerField(verbose_name="Внешний ИД")
+    product = models.ForeignKey(
+        Product,
+        verbose_name="Продукт",
+        related_name="staging_items",
+        on_delete=models.CASCADE,
+    )
+    model = models.CharField(verbose_name="Модель", max_length=80, blank=True)
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    price = models.PositiveIntegerField(verbose_name="Цена")
+    price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая цена")
+    parameters = models.JSONField(verbose_name="Параметры", default=dict)
+
+    def __str__(self):
+        return f"{self.import_key} {self.external_id}"
+
+    class Meta:
+        verbose_name = "Строка параллельного импорта"
+        verbose_name_plural = "Строки параллельного импорта"
+        indexes = [
+            models.Index(
+                fields=["import_key", "external_id"], name="staging_key_external_id"
+            )
+        ]
 
 
 class Parameter(models.Model):
@@ -254,6 +454,9 @@ class Parameter(models.Model):
         ordering = ["-name"]
         verbose_name = "Параметр"
         verbose_name_plural = "Параметры"
+        constraints = [
+            models.UniqueConstraint(fields=["name"], name="unique_parameter")
+        ]
 
 
 class ProductParameter(models.Model):
@@ -286,6 +489,83 @@ class ProductParameter(models.Model):
                 fields=["product_info", "parameter"], name="unique_product_parameter"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["parameter", "value", "product_info"],
+                name="product_parameter_value",
+            )
+        ]
+
+
+class CatalogEntry(models.Model):
+    """
+    Витрина каталога: одна плоская строка на ProductInfo.
+
+    Названия магазина, категории и продукта, цены и параметры хранятся готовыми
+    к выдаче, чтобы каталог читался одним запросом. parameters - список пар
+    [название, значение] в порядке выдачи. Строки пересчитываются при импорте
+    и при изменении исходных записей, см. backend/catalog.py.
+    """
+
+    objects = models.manager.Manager()
+    product_info = models.OneToOneField(
+        ProductInfo,
+        verbose_name="Информация о продукте",
+        related_name="catalog_entry",
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+    shop = models.ForeignKey(
+        Shop,
+        verbose_name="Магазин",
+        related_name="catalog_entries",
+        on_delete=models.CASCADE,
+    )
+    shop_name = models.CharField(verbose_name="Название магазина", max_length=100)
+    category = models.ForeignKey(
+        Category,
+        verbose_name="Категория",
+        related_name="catalog_entries",
+        on_delete=models.CASCADE,
+    )
+    category_name = models.CharField(verbose_name="Название категории", max_length=100)
+    product = models.ForeignKey(
+        Product,
+        verbose_name="Продукт",
+        related_name="catalog_entries",
+        on_delete=models.CASCADE,
+    )
+    product_name = models.CharField(verbose_name="Название продукта", max_length=100)
+    model = models.CharField(verbose_name="Модель", max_length=80, blank=True)
+    external_id = models.PositiveIntegerField(verbose_name="Внешний ИД")
+    quantity = models.PositiveIntegerField(verbose_name="Количество")
+    price = models.PositiveIntegerField(verbose_name="Цена")
+    price_rrc = models.PositiveIntegerField(verbose_name="Рекомендуемая цена")
+    parameters = models.JSONField(verbose_name="Параметры", default=list)
+
+    def __str__(self):
+        return self.product_name
+
+    class Meta:
+        verbose_name = "Строка витрины каталога"
+        verbose_name_plural = "Витрина каталога"
+        # Сортировки и диапазоны каталога; pk в конце индекса - для курсора
+        indexes = [
+            models.Index(fields=["price", "product_info"], name="catalog_price"),
+            models.Index(
+                fields=["price_rrc", "product_info"], name="catalog_price_rrc"
+            ),
+            models.Index(fields=["quantity", "product_info"], name="catalog_quantity"),
+            # Подсказки поиска: триграммы названия и модели (расширение pg_trgm)
+            GistIndex(
+                fields=["product_name"],
+                name="catalog_product_name_trgm",
+                opclasses=["gist_trgm_ops"],
+            ),
+            GistIndex(
+                fields=["model"], name="catalog_model_trgm", opclasses=["gist_trgm_ops"]
+            ),
+        ]
 
 
 class ContactInfo(models.Model):
@@ -335,6 +615,14 @@ class Order(models.Model):
         null=True,
         on_delete=models.CASCADE,
     )
+    # Итоги по позициям заказа, пересчитываются при каждом изменении позиций
+    # (backend/basket.py, refresh_order_totals)
+    total_sum = models.PositiveBigIntegerField(
+        verbose_name="Сумма заказа", default=0, editable=False
+    )
+    items_count = models.PositiveIntegerField(
+        verbose_name="Число позиций", default=0, editable=False
+    )
 
     def __str__(self):
         return f"{self.user} {self.dt}"
@@ -343,6 +631,14 @@ class Order(models.Model):
         ordering = ["-dt"]
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        constraints = [
+            # Корзина у пользователя одна, см. backend/basket.py, basket_id
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status="basket"),
+                name="unique_user_basket",
+            ),
+        ]
 
 
 class OrderItem(models.Model):
@@ -371,10 +667,20 @@ class OrderItem(models.Model):
         on_delete=models.CASCADE,
     )
     quantity = models.PositiveIntegerField(verbose_name="Количество")
+    # Цена за единицу: в корзине - на момент изменения позиции, в оформленном
+    # заказе - зафиксированная при оформлении
+    price = models.PositiveIntegerField(verbose_name="Цена", blank=True)
 
     def __str__(self):
         return f"{self.order} {self.product_info}"
 
+    def save(self, *args, **kwargs):
+        # Позиции, добавленные в обход backend/basket.py (админка, ORM),
+        # получают текущую цену товара
+        if self.price is None and self.product_info_id is not None:
+            self.price = self.product_info.price
+        return super(OrderItem, self).save(*args, **kwargs)
+
     class Meta:
         ordering = ["-order"]
         verbose_name = "Позиция заказа"
@@ -0,0 +1,139 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, Q, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import catalog_ordering
+
+
+class ProductInfoCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация каталога по ключу (keyset) без OFFSET.
+
+    Курсор хранит значения всех полей сортировки последней строки страницы,
+    например (price, product_info_id), и следующая страница выбирается
+    сравнением строк (price, product_info_id) > (%s, %s) по индексу
+    (поле, product_info). Ключ позиции уникален, поэтому глубокие страницы и
+    большие группы одинаковых цен или количеств стоят столько же, сколько
+    первая страница. Результаты полнотекстового поиска листаются по убыванию
+    ранга и возрастанию ключа, параметр ordering задает сортировку по цене,
+    РРЦ или количеству (см. filters.catalog_ordering). Размер страницы
+    задается параметром page_size.
+    """
+
+    ordering = "product_info_id"
+    page_size = settings.PRODUCTS_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.PRODUCTS_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return catalog_ordering(request.query_params, queryset)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self.following(queryset, ordering, self.cursor.position)
+            )
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.display_page_controls = self.has_previous or self.has_next
+        return self.page
+
+    def following(self, queryset, ordering, position):
+        """
+        Условие на строки после позиции position в порядке ordering.
+
+        При одинаковом направлении всех полей - сравнение строк, которое
+        Postgres выполняет по составному индексу; при смешанном (поиск:
+        -rank, product_info_id) - раскрытое условие через OR.
+        """
+        fields = [name.lstrip("-") for name in ordering]
+        if len(position) != len(fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [
+                queryset.query.resolve_ref(field).output_field.to_python(value)
+                for field, value in zip(fields, position)
+            ]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        descending = [name.startswith("-") for name in ordering]
+        if len(set(descending)) == 1:
+            lookup = LessThan if descending[0] else GreaterThan
+            return lookup(
+                Func(*map(F, fields), function="ROW", output_field=Field()),
+                Func(*map(Value, values), function="ROW", output_field=Field()),
+            )
+        condition, equal = Q(), {}
+        for field, value, desc in zip(fields, values, descending):
+            condition |= Q(**equal, **{f"{field}__{'lt' if desc else 'gt'}": value})
+            equal[field] = value
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Перед позицией курсора ничего нет - это первая страница
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        position = self.position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.position(self.page[0]) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def position(self, item):
+        return [
+            str(item[name] if isinstance(item, dict) else getattr(item, name))
+            for name in (name.lstrip("-") for name in self.ordering)
+        ]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = bool(int(tokens.get("r", ["0"])[0]))
+            position = tokens["p"]
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        tokens = {"p": cursor.position}
+        if cursor.reverse:
+            tokens["r"] = "1"
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+def reverse_ordering(ordering):
+    return tuple(name[1:] if name.startswith("-") else f"-{name}" for name in ordering)
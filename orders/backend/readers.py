@@ -0,0 +1,277 @@
+import csv
+import io
+import os
+from urllib.parse import urlparse
+
+from ujson import load as load_json, loads as loads_json
+from yaml.events import (
+    AliasEvent,
+    ScalarEvent,
+    SequenceStartEvent,
+    SequenceEndEvent,
+    MappingStartEvent,
+    MappingEndEvent,
+)
+from yaml.nodes import ScalarNode, SequenceNode, MappingNode
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+class YamlPriceList:
+    """
+    Потоковый разбор YAML-прайса.
+
+    Секции shop и categories читаются сразу, товары из секции goods отдаются
+    генератором goods() по одному по мере разбора, поэтому потребление памяти
+    не зависит от размера файла. stream - любой объект с методом read(),
+    например файл или response.raw. Если goods идет раньше shop или categories,
+    товары при первом проходе пропускаются, а затем поток перематывается к
+    началу - для такого порядка ключей stream должен поддерживать seek().
+    """
+
+    HEADER_KEYS = {"shop", "categories"}
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._start = stream.tell() if self._seekable() else None
+        self.loader = SafeLoader(stream)
+        self.shop = None
+        self.categories = []
+        self._goods_started = False
+        self._rewound = False
+        self._read_header()
+
+    def _expect(self, event_class):
+        event = self.loader.get_event()
+        if not isinstance(event, event_class):
+            raise ValueError(f"Неверный формат прайса: {event}")
+        return event
+
+    def _seekable(self):
+        seekable = getattr(self.stream, "seekable", None)
+        return bool(seekable and seekable())
+
+    def _read_header(self, rewound=False):
+        self.loader.get_event()  # StreamStartEvent
+        self.loader.get_event()  # DocumentStartEvent
+        self._expect(MappingStartEvent)
+        seen = set()
+        skipped = False
+        while not self.loader.check_event(MappingEndEvent):
+            key = self._expect(ScalarEvent).value
+            if key == "goods":
+                if rewound or seen >= self.HEADER_KEYS or self._start is None:
+                    self._expect(SequenceStartEvent)
+                    self._goods_started = True
+                    return
+                # Заголовок еще не дочитан: shop и categories могут идти после
+                # goods, поэтому товары пропускаются без разбора, а после
+                # заголовка поток перематывается к началу
+                self._skip()
+                skipped = True
+                continue
+            value = self._construct(self.loader.get_event())
+            seen.add(key)
+            if key == "shop":
+                self.shop = value
+            elif key == "categories":
+                self.categories = value
+        if skipped:
+            self.stream.seek(self._start)
+            self.loader = SafeLoader(self.stream)
+            self._rewound = True
+            self._read_header(rewound=True)
+
+    def _skip(self):
+        depth = 0
+        while True:
+            event = self.loader.get_event()
+            if isinstance(event, (SequenceStartEvent, MappingStartEvent)):
+                depth += 1
+            elif isinstance(event, (SequenceEndEvent, MappingEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+    def _construct(self, event):
+        return self.loader.construct_document(self._compose(event))
+
+    def _resolve(self, kind, event, value=None):
+        if event.tag is None or event.tag == "!":
+            return self.loader.resolve(kind, value, event.implicit)
+        return event.tag
+
+    def _compose(self, event):
+        loader = self.loader
+        if isinstance(event, AliasEvent):
+            raise ValueError("Ссылки (алиасы) в прайсе не поддерживаются")
+        if isinstance(event, ScalarEvent):
+            return ScalarNode(
+                self._resolve(ScalarNode, event, event.value),
+                event.value,
+                event.start_mark,
+                event.end_mark,
+                style=event.style,
+            )
+        if isinstance(event, SequenceStartEvent):
+            node = SequenceNode(
+                self._resolve(SequenceNode, event), [], event.start_mark, None
+            )
+            while not loader.check_event(SequenceEndEvent):
+                node.value.append(self._compose(loader.get_event()))
+            node.end_mark = loader.get_event().end_mark
+            return node
+        node = MappingNode(
+            self._resolve(MappingNode, event), [], event.start_mark, None
+        )
+        while not loader.check_event(MappingEndEvent):
+            key = self._compose(loader.get_event())
+            node.value.append((key, self._compose(loader.get_event())))
+        node.end_mark = loader.get_event().end_mark
+        return node
+
+    def goods(self):
+        if not self._goods_started:
+            return
+        while not self.loader.check_event(SequenceEndEvent):
+            yield self._construct(self.loader.get_event())
+        self.loader.get_event()  # SequenceEndEvent
+        self._goods_started = False
+        if self._rewound:
+            return
+        # Поток без seek(): заголовок после goods уже не применить к товарам
+        while not self.loader.check_event(MappingEndEvent):
+            key = self._expect(ScalarEvent).value
+            if key in self.HEADER_KEYS:
+                raise ValueError(
+                    f"Неверный формат прайса: секция {key} идет после goods"
+                )
+            self._skip()
+
+
+class JsonPriceList:
+    """
+    JSON-прайс той же структуры, что и YAML: {"shop", "categories", "goods"}.
+
+    Документ JSON разбирается целиком, поэтому для крупных прайсов лучше
+    подходит NDJSON.
+    """
+
+    def __init__(self, stream):
+        data = load_json(stream)
+        self.shop = data["shop"]
+        self.categories = data.get("categories", [])
+        self._goods = data.get("goods", [])
+
+    def goods(self):
+        yield from self._goods
+
+
+class NdjsonPriceList:
+    """
+    NDJSON-прайс: первая строка - {"shop": ..., "categories": [...]},
+    каждая следующая строка - один товар. Читается построчно.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        header = loads_json(stream.readline())
+        self.shop = header["shop"]
+        self.categories = header.get("categories", [])
+
+    def goods(self):
+        for line in self.stream:
+            if line.strip():
+                yield loads_json(line)
+
+
+class CsvPriceList:
+    """
+    CSV-прайс, одна строка на товар.
+
+    Обязательные колонки: shop, category, category_name, id, model, name, price,
+    price_rrc, quantity. Параметры товара передаются колонками с префиксом
+    "param:", например "param:Цвет"; пустые ячейки параметров пропускаются.
+    Магазин и категории собираются первым проходом по файлу, товары отдаются
+    вторым, поэтому поток должен поддерживать seek().
+    """
+
+    PARAMETER_PREFIX = "param:"
+
+    def __init__(self, stream):
+        self.stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        self.shop = None
+        categories = {}
+        for row in csv.DictReader(self.stream):
+            self.shop = self.shop or row["shop"]
+            categories.setdefault(int(row["category"]), row["category_name"])
+        self.categories = [
+            {"id": category_id, "name": name}
+            for category_id, name in categories.items()
+        ]
+
+    def goods(self):
+        self.stream.seek(0)
+        for row in csv.DictReader(self.stream):
+            yield {
+                "id": int(row["id"]),
+                "category": int(row["category"]),
+                "model": row["model"],
+                "name": row["name"],
+                "price": int(row["price"]),
+                "price_rrc": int(row["price_rrc"]),
+                "quantity": int(row["quantity"]),
+                "parameters": {
+                    name[len(self.PARAMETER_PREFIX) :]: value
+                    for name, value in row.items()
+                    if name.startswith(self.PARAMETER_PREFIX) and value != ""
+                },
+            }
+
+
+PRICE_LIST_READERS = {
+    "yaml": YamlPriceList,
+    "json": JsonPriceList,
+    "ndjson": NdjsonPriceList,
+    "csv": CsvPriceList,
+}
+
+PRICE_LIST_CONTENT_TYPES = {
+    "application/x-yaml": "yaml",
+    "application/yaml": "yaml",
+    "text/yaml": "yaml",
+    "text/x-yaml": "yaml",
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+PRICE_LIST_EXTENSIONS = {
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+
+def detect_format(content_type="", filename=""):
+    """Формат прайса по типу содержимого, затем по расширению; по умолчанию YAML."""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in PRICE_LIST_CONTENT_TYPES:
+        return PRICE_LIST_CONTENT_TYPES[content_type]
+    extension = os.path.splitext(urlparse(filename or "").path)[1].lower()
+    return PRICE_LIST_EXTENSIONS.get(extension, "yaml")
+
+
+def open_price_list(stream, price_format="yaml"):
+    try:
+        reader = PRICE_LIST_READERS[price_format]
+    except KeyError:
+        raise ValueError(f"Неизвестный формат прайса: {price_format}")
+    return reader(stream)
@@ -7,11 +7,13 @@ from .models import (
     Product,
     ProductInfo,
     ProductParameter,
+    CatalogEntry,
     ContactInfo,
     Order,
     OrderItem,
     AvatarUser,
     AvatarProduct,
+    ImportJob,
 )
 
 from rest_framework.validators import UniqueValidator
@@ -170,6 +172,86 @@ class ProductInfoSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
+class CatalogEntrySerializer(serializers.ModelSerializer):
+    """Строка витрины каталога в том же виде, что и ProductInfoSerializer."""
+
+    id = serializers.IntegerField(source="product_info_id")
+    product = serializers.SerializerMethodField()
+    shop = serializers.IntegerField(source="shop_id")
+    product_parameters = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CatalogEntry
+        fields = (
+            "id",
+            "model",
+            "external_id",
+            "product",
+            "shop",
+            "quantity",
+            "price",
+            "price_rrc",
+            "product_parameters",
+        )
+        read_only_fields = fields
+
+    @staticmethod
+    def get_product(obj):
+        return {
+            "id": obj.product_id,
+            "name": obj.product_name,
+            "category": obj.category_name,
+        }
+
+    @staticmethod
+    def get_product_parameters(obj):
+        return [{"parameter": name, "value": value} for name, value in obj.parameters]
+
+
+CATALOG_ENTRY_COLUMNS = (
+    "product_info_id",
+    "model",
+    "external_id",
+    "product_id",
+    "product_name",
+    "category_name",
+    "shop_id",
+    "quantity",
+    "price",
+    "price_rrc",
+    "parameters",
+)
+
+
+def serialize_catalog_entries(rows):
+    """
+    Быстрый путь CatalogEntrySerializer для строк values(*CATALOG_ENTRY_COLUMNS).
+
+    Словари собираются напрямую, без полей DRF, в том же порядке ключей, поэтому
+    JSON совпадает с выдачей ProductInfoSerializer байт в байт.
+    """
+    return [
+        {
+            "id": row["product_info_id"],
+            "model": row["model"],
+            "external_id": row["external_id"],
+            "product": {
+                "id": row["product_id"],
+                "name": row["product_name"],
+                "category": row["category_name"],
+            },
+            "shop": row["shop_id"],
+            "quantity": row["quantity"],
+            "price": row["price"],
+            "price_rrc": row["price_rrc"],
+            "product_parameters": [
+                {"parameter": name, "value": value} for name, value in row["parameters"]
+            ],
+        }
+        for row in rows
+    ]
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
@@ -177,9 +259,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "id",
             "product_info",
             "quantity",
+            "price",
             "order",
         )
-        read_only_fields = ("id",)
+        read_only_fields = ("id", "price")
         extra_kwargs = {"order": {"write_only": True}}
 
 
@@ -189,7 +272,7 @@ class OrderItemCreateSerializer(OrderItemSerializer):
 
 class OrderSerializer(serializers.ModelSerializer):
     ordered_items = OrderItemCreateSerializer(read_only=True, many=True)
-    total_sum = serializers.IntegerField()
+    total_sum = serializers.IntegerField(read_only=True)
     contact = ContactInfoSerializer(read_only=True)
 
     class Meta:
@@ -199,9 +282,16 @@ class OrderSerializer(serializers.ModelSerializer):
             "ordered_items",
             "status",
             "total_sum",
+            "items_count",
             "contact",
         )
-        read_only_fields = ("id",)
+        read_only_fields = ("id", "items_count")
+
+
+class PartnerOrderSerializer(OrderSerializer):
+    """Заказ для партнера: сумма только по позициям его магазина."""
+
+    total_sum = serializers.IntegerField(source="shop_total", read_only=True)
 
 
 class AvatarUserSerializer(serializers.ModelSerializer):
@@ -220,3 +310,40 @@ class AvatarProductSerializer(serializers.ModelSerializer):
         model = AvatarProduct
         fields = ("id", "product", "title", "image")
         read_only_fields = ("id", "product", "title", "image")
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    goods_per_sec = serializers.FloatField(read_only=True)
+    eta = serializers.FloatField(read_only=True)
+    diff = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = (
+            "id",
+            "task_id",
+            "shop",
+            "url",
+            "filename",
+            "state",
+            "goods_processed",
+            "goods_per_sec",
+            "bytes_total",
+            "bytes_processed",
+            "eta",
+            "diff",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields = fields
+
+    @staticmethod
+    def get_diff(obj):
+        return {
+            "inserted": obj.inserted,
+            "updated": obj.updated,
+            "deleted": obj.deleted,
+            "unchanged": obj.unchanged,
+        }
@@ -1,9 +1,23 @@
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import Signal, receiver
 from django_rest_passwordreset.signals import reset_password_token_created
 
-from .models import ConfirmEmailToken, CustomUser
+from .basket import close_basket
+from .caching import bump_catalog_version_on_commit
+from .catalog import refresh_catalog, refresh_catalog_where, sync_category_names
+from .models import (
+    ConfirmEmailToken,
+    CustomUser,
+    Category,
+    Order,
+    Shop,
+    Product,
+    ProductInfo,
+    Parameter,
+    ProductParameter,
+)
 
 new_user_registered = Signal()
 new_order = Signal()
@@ -54,3 +68,79 @@ def new_order_signal(user_id, **kwargs):
         [user.email],
     )
     message.send()
+
+
+# Витрина и кэш каталога при правках через ORM и админку. Импорт пишет пачками
+# в обход сигналов и обновляет их сам. Обработчики удаления позиций и их
+# параметров не заводятся: они отключили бы быстрое каскадное удаление при
+# импорте.
+
+
+@receiver(post_save, sender=ProductInfo)
+def product_info_saved(instance, **kwargs):
+    refresh_catalog([instance.id])
+    bump_catalog_version_on_commit(instance.shop_id)
+
+
+@receiver(post_save, sender=ProductParameter)
+def product_parameter_saved(instance, **kwargs):
+    refresh_catalog([instance.product_info_id])
+    bump_catalog_version_on_commit(instance.product_info.shop_id)
+
+
+def name_changed(created, update_fields):
+    return not created and (update_fields is None or "name" in update_fields)
+
+
+@receiver(post_save, sender=Shop)
+def shop_saved(instance, created, update_fields, **kwargs):
+    if name_changed(created, update_fields):
+        refresh_catalog_where(shop_id=instance.id)
+    bump_catalog_version_on_commit(instance.id)
+
+
+@receiver(post_delete, sender=Shop)
+def shop_deleted(instance, **kwargs):
+    bump_catalog_version_on_commit(instance.id)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(instance, created, update_fields, **kwargs):
+    if name_changed(created, update_fields):
+        sync_category_names([instance.id])
+    bump_catalog_version_on_commit()
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(instance, **kwargs):
+    bump_catalog_version_on_commit()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(instance, created, update_fields, **kwargs):
+    if not created:
+        refresh_catalog_where(product_id=instance.id)
+        bump_catalog_version_on_commit()
+
+
+@receiver(post_save, sender=Parameter)
+def parameter_saved(instance, created, update_fields, **kwargs):
+    if name_changed(created, update_fields):
+        refresh_catalog_where(product_parameters__parameter_id=instance.id)
+        bump_catalog_version_on_commit()
+
+
+# Кэш id корзины (backend/basket.py, basket_id) при правках заказов через ORM
+# и админку. Оформление через checkout сбрасывает его само.
+
+
+@receiver(post_save, sender=Order)
+def order_saved(instance, **kwargs):
+    if instance.status != "basket":
+        close_basket(instance.user_id)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(instance, **kwargs):
+    if instance.status == "basket":
+        close_basket(instance.user_id)
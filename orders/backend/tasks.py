@@ -1,4 +1,6 @@
 import os
+import shutil
+import uuid
 import rollbar
 
 rollbar.init(
@@ -13,24 +15,31 @@ def celery_base_data_hook(request, data):
 
 rollbar.BASE_DATA_HOOK = celery_base_data_hook
 
-from celery import shared_task
+from celery import chord, shared_task
 from celery.signals import task_failure
-import requests
 from easy_thumbnails.files import get_thumbnailer
-from yaml import load as load_yaml, Loader
 from django.conf import settings
 from django.core.mail import send_mail
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.db.models import F
+from ujson import dumps as dump_json, loads as load_json
 
+from .feeds import LocalFeed, SupplierFeed
+from .importer import (
+    batched,
+    import_categories,
+    import_mode,
+    import_price_list,
+    merge_staged_goods,
+    stage_goods,
+)
+from .readers import detect_format, open_price_list
 from .models import (
     Shop,
-    Category,
-    Product,
-    Parameter,
-    ProductParameter,
-    ProductInfo,
+    ImportJob,
+    ImportStagingItem,
     AvatarUser,
     AvatarProduct,
 )
@@ -47,49 +56,182 @@ def send_email(subject, message, email):
 
 
 @shared_task
-def get_import(partner, url):
+def get_import(partner, url, batch_size=None, mode=None, job_id=None, path=None):
+    job = ImportJob.objects.filter(pk=job_id).first() if job_id else None
+    try:
+        result = run_import(partner, url, batch_size, mode, job, path)
+    except Exception as e:
+        if job is not None:
+            job.finish("failed", error=str(e))
+        raise
+    if job is not None:
+        if not result["Status"]:
+            job.finish("failed", error=result.get("Error") or result.get("Errors"))
+        elif "Skipped" in result:
+            job.finish("skipped")
+        elif "Chunks" in result:
+            pass  # Задачу завершит finalize_import
+        else:
+            job.finish("done", result["Stats"])
+    return result
+
+
+def enqueue_import(partner, url="", filename="", **kwargs):
+    """
+    Создает задачу импорта и ставит get_import в очередь Celery.
+
+    Для загруженного файла передается path - путь к нему в IMPORT_SPOOL_DIR;
+    в сообщение Celery попадает только путь, а не содержимое.
+    """
+    job = ImportJob.objects.create(user_id=partner, url=url, filename=filename)
+    task = get_import.delay(partner, url, job_id=job.id, **kwargs)
+    ImportJob.objects.filter(pk=job.pk).update(task_id=task.id)
+    job.task_id = task.id
+    return job, task
+
+
+def run_import(partner, url, batch_size=None, mode=None, job=None, path=None):
+    if path:
+        feed = LocalFeed(path, Shop.objects.filter(user_id=partner).first())
+        return import_feed(partner, feed, batch_size, mode, job)
     if url:
         validate_url = URLValidator()
         try:
             validate_url(url)
         except ValidationError as e:
             return {"Status": False, "Error": str(e)}
-        else:
-            stream = requests.get(url).content
-        data = load_yaml(stream, Loader=Loader)
+        feed = SupplierFeed(url, Shop.objects.filter(user_id=partner).first())
+        return import_feed(partner, feed, batch_size, mode, job)
+    return {"Status": False, "Errors": "Url-адрес является ложным"}
+
+
+def import_feed(partner, feed, batch_size=None, mode=None, job=None):
+    with feed:
+        if feed.fetch().skip_reason:
+            # Прайс не изменился с последнего успешного импорта
+            feed.record_skip()
+            return {"Status": True, "Skipped": feed.skip_reason}
+        if job is not None:
+            job.start(bytes_total=feed.size)
+        price_list = open_price_list(
+            feed.file, detect_format(feed.content_type, feed.url)
+        )
         try:
-            shop, _ = Shop.objects.get_or_create(name=data["shop"], user_id=partner)
+            shop, _ = Shop.objects.get_or_create(name=price_list.shop, user_id=partner)
         except IntegrityError as e:
             return {"Status": False, "Error": str(e)}
-        for category in data["categories"]:
-            category_object, _ = Category.objects.get_or_create(
-                id=category["id"], name=category["name"]
-            )
-            category_object.shops.add(shop.id)
-            category_object.save()
-        ProductInfo.objects.filter(shop_id=shop.id).delete()
-        for item in data["goods"]:
-            product, _ = Product.objects.get_or_create(
-                name=item["name"], category_id=item["category"]
-            )
-            product_info = ProductInfo.objects.create(
-                product_id=product.id,
-                external_id=item["id"],
-                model=item["model"],
-                price=item["price"],
-                price_rrc=item["price_rrc"],
-                quantity=item["quantity"],
-                shop_id=shop.id,
-            )
-            for name, value in item["parameters"].items():
-                parameter_object, _ = Parameter.objects.get_or_create(name=name)
-                ProductParameter.objects.create(
-                    product_info_id=product_info.id,
-                    parameter_id=parameter_object.id,
-                    value=value,
+        if job is not None:
+            job.shop = shop
+            job.save(update_fields=["shop"])
+            if feed.size >= settings.IMPORT_PARALLEL_MIN_BYTES:
+                return start_parallel_import(
+                    shop, price_list, feed, job, batch_size, mode
                 )
-        return {"Status": True}
-    return {"Status": False, "Errors": "Url-адрес является ложным"}
+
+        def progress(goods_processed):
+            if job is not None:
+                job.set_progress(goods_processed, feed.file.tell())
+
+        stats = import_price_list(
+            shop,
+            price_list.categories,
+            price_list.goods(),
+            batch_size=batch_size,
+            mode=mode,
+            progress=progress,
+        )
+        feed.remember(shop)
+    return {"Status": True, "Stats": stats}
+
+
+def start_parallel_import(shop, price_list, feed, job, batch_size=None, mode=None):
+    """
+    Делит товары прайса на файлы-части и импортирует их группой задач Celery.
+
+    Части пишутся в промежуточную таблицу параллельно, а finalize_import
+    одной транзакцией переносит их в каталог в режиме mode (см.
+    merge_staged_goods). Если часть не импортировалась, import_failed после
+    завершения всех частей удаляет промежуточные строки и файлы импорта.
+    """
+    mode = import_mode(mode)
+    import_key = str(uuid.uuid4())
+    spool_dir = os.path.join(settings.IMPORT_SPOOL_DIR, import_key)
+    os.makedirs(spool_dir)
+    import_categories(shop, price_list.categories)
+    paths = []
+    for number, chunk in enumerate(
+        batched(price_list.goods(), settings.IMPORT_PARALLEL_CHUNK_SIZE)
+    ):
+        path = os.path.join(spool_dir, f"chunk-{number}.ndjson")
+        with open(path, "w", encoding="utf-8") as stream:
+            for item in chunk:
+                stream.write(dump_json(item, ensure_ascii=False))
+                stream.write("\n")
+        paths.append(path)
+    finalize = finalize_import.s(shop.id, import_key, job.id, feed.validators, mode)
+    if paths:
+        chord(import_chunk.s(path, import_key, job.id, batch_size) for path in paths)(
+            finalize.on_error(import_failed.s(import_key, job.id))
+        )
+    else:
+        finalize.delay([])
+    return {"Status": True, "Chunks": len(paths)}
+
+
+@shared_task
+def import_chunk(path, import_key, job_id, batch_size=None):
+    if ImportJob.objects.filter(pk=job_id, state="failed").exists():
+        return 0
+    try:
+        with open(path, encoding="utf-8") as stream:
+            staged = stage_goods(
+                import_key, (load_json(line) for line in stream), batch_size
+            )
+    except Exception as e:
+        # Строки и файлы удалит import_failed, когда завершатся все части
+        ImportJob.objects.get(pk=job_id).finish("failed", error=str(e))
+        raise
+    ImportJob.objects.filter(pk=job_id).update(
+        goods_processed=F("goods_processed") + staged
+    )
+    return staged
+
+
+@shared_task
+def finalize_import(results, shop_id, import_key, job_id, validators, mode=None):
+    job = ImportJob.objects.get(pk=job_id)
+    try:
+        if job.state == "failed":
+            return {"Status": False, "Error": job.error}
+        stats = merge_staged_goods(Shop.objects.get(pk=shop_id), import_key, mode)
+        Shop.objects.filter(pk=shop_id).update(**validators)
+        job.finish("done", stats)
+    except Exception as e:
+        job.finish("failed", error=str(e))
+        ImportStagingItem.objects.filter(import_key=import_key).delete()
+        raise
+    finally:
+        shutil.rmtree(
+            os.path.join(settings.IMPORT_SPOOL_DIR, import_key), ignore_errors=True
+        )
+    return {"Status": True, "Stats": stats}
+
+
+@shared_task
+def import_failed(request, exc, traceback, import_key, job_id):
+    """
+    Обработчик ошибки группы частей параллельного импорта.
+
+    Вызывается после завершения всех частей, поэтому удаляет и строки,
+    записанные частями, закончившими работу позже упавшей.
+    """
+    job = ImportJob.objects.get(pk=job_id)
+    if job.state != "failed":
+        job.finish("failed", error=str(exc))
+    ImportStagingItem.objects.filter(import_key=import_key).delete()
+    shutil.rmtree(
+        os.path.join(settings.IMPORT_SPOOL_DIR, import_key), ignore_errors=True
+    )
 
 
 @shared_task
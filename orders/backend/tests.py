@@ -1,16 +1,76 @@
+import copy
+import csv
+import gzip
+import io
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import celery
 import pytest
+import yaml
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 # from rest_framework.test import APIClient
 from rest_framework.status import (
     HTTP_200_OK,
     HTTP_201_CREATED,
+    HTTP_202_ACCEPTED,
     HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
     HTTP_403_FORBIDDEN,
+    HTTP_404_NOT_FOUND,
 )
 
 # from .models import ContactInfo, Order, CustomUser
+from backend.basket import (
+    add_to_basket,
+    basket_cache_key,
+    basket_id,
+    checkout,
+    refresh_order_totals,
+    update_basket,
+)
+from backend.benchmarks import (
+    benchmark_catalog_serializers,
+    benchmark_checkout,
+    benchmark_import,
+    generate_price_list,
+    write_price_list,
+)
+from backend.caching import bump_catalog_version_on_commit
+from backend.filters import (
+    catalog_ordering,
+    filter_catalog,
+    has_trigram_extension,
+)
+from backend.importer import (
+    batched,
+    import_price_list,
+    merge_staged_goods,
+    stage_goods,
+)
+from backend.models import (
+    CatalogEntry,
+    ImportJob,
+    ImportSkip,
+    ImportStagingItem,
+    Order,
+    OrderItem,
+    Product,
+    ProductInfo,
+    ProductParameter,
+    Shop,
+)
+from backend.serializers import ProductInfoSerializer
+from backend.readers import YamlPriceList, open_price_list
+from backend.tasks import enqueue_import, get_import
 
 
 # Create your tests here.
@@ -201,6 +261,451 @@ def test_products(
     assert response.json().get("results")[0]["id"] == 2
 
 
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_cursor_pagination(
+    api_client, shop_factory, category_factory, product_factory, product_info_factory
+):
+    """Тест курсорной пагинации каталога: страницы без OFFSET и без пропусков."""
+    shop = shop_factory(status=True)
+    product = product_factory(category=category_factory())
+    expected = sorted(
+        product_info_factory(shop=shop, product=product).id for _ in range(5)
+    )
+    product_info_factory(shop=shop_factory(status=False), product=product)
+    url = f"{reverse('product-search')}?page_size=2"
+    ids = []
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+        assert response.status_code == HTTP_200_OK
+        catalog_sql = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('SELECT "backend_catalogentry"')
+        ]
+        assert catalog_sql
+        assert not any("OFFSET" in sql for sql in catalog_sql)
+        ids += [item["id"] for item in response.json()["results"]]
+        url = response.json()["next"]
+    assert ids == expected
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_keyset_pagination_ties(api_client, shop_factory, price_list):
+    """Тест курсора (значение, ключ): больше offset_cutoff равных значений и рангов."""
+    shop = shop_factory(status=True)
+    item = price_list["goods"][0]
+    goods = [
+        {**item, "id": external_id, "model": f"model-{external_id}"}
+        for external_id in range(1300)
+    ]
+    import_price_list(shop, price_list["categories"], goods)
+    url = reverse("product-search")
+
+    def pages(page, data):
+        ids = []
+        while page:
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.get(page, data)
+            assert response.status_code == HTTP_200_OK
+            assert not any(
+                "OFFSET" in query["sql"]
+                for query in queries
+                if query["sql"].startswith('SELECT "backend_catalogentry"')
+            )
+            ids.append([item["id"] for item in response.json()["results"]])
+            page, data = response.json()["next"], None
+        return ids, response.json()["previous"]
+
+    expected = sorted(CatalogEntry.objects.values_list("pk", flat=True))
+    # Одинаковые названия дают одинаковый ранг поиска: порядок (-rank, ключ)
+    search = {"q": item["name"].split()[0]}
+    ranks = filter_catalog(search).values_list("rank", flat=True).distinct()
+    assert len(ranks) == 1
+    for data in ({"ordering": "quantity"}, {"ordering": "-price"}, search):
+        ids, previous = pages(url, {"page_size": 500, **data})
+        assert len(ids) == 3
+        flat = sum(ids, [])
+        if data.get("ordering", "").startswith("-"):
+            flat.reverse()
+        assert flat == expected
+        # Ссылка назад с последней страницы ведет на предыдущую
+        response = api_client.get(previous)
+        assert [item["id"] for item in response.json()["results"]] == ids[1]
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_search(api_client, shop_factory, price_list):
+    """Тест полнотекстового поиска по названию, модели и параметрам с рангом."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    url = reverse("product-search")
+
+    def search(q):
+        ids, page, data = [], url, {"page_size": 2, "q": q}
+        while page:
+            response = api_client.get(page, data)
+            assert response.status_code == HTTP_200_OK
+            ids += [item["external_id"] for item in response.json()["results"]]
+            page, data = response.json()["next"], None
+        return ids
+
+    by_name = {item["name"]: item["id"] for item in price_list["goods"]}
+    assert len(search("смартфоны iphone")) == 4
+    assert sorted(search("3840x2160")) == sorted(
+        item["id"]
+        for item in price_list["goods"]
+        if "3840x2160" in map(str, item["parameters"].values())
+    )
+    found = search("xr or 512gb")
+    assert len(found) == 4
+    # Совпадение и в названии, и в модели ранжируется выше
+    assert found[-1] == by_name["Смартфон Apple iPhone XS Max 512GB (золотистый)"]
+    goods = copy.deepcopy(price_list["goods"])
+    goods[0]["parameters"]["Цвет"] = "изумрудный"
+    import_price_list(shop, price_list["categories"], goods)
+    assert search("изумрудный") == [goods[0]["id"]]
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_parameter_filters_and_facets(api_client, shop_factory, price_list):
+    """Тест фильтров по параметрам каталога и подсчета значений (фасетов)."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+
+    def matching(**filters):
+        return sorted(
+            item["id"]
+            for item in price_list["goods"]
+            if all(
+                str(item["parameters"].get(name)) in values
+                for name, values in filters.items()
+            )
+        )
+
+    response = api_client.get(
+        reverse("product-search"),
+        {"param[Цвет]": ["красный", "черный"], "param[Встроенная память (Гб)]": "256"},
+    )
+    assert sorted(item["external_id"] for item in response.json()["results"]) == (
+        matching(**{"Цвет": ["красный", "черный"], "Встроенная память (Гб)": ["256"]})
+    )
+    response = api_client.get(reverse("product-search"), {"param[Нет такого]": "1"})
+    assert response.json()["results"] == []
+
+    response = api_client.get(reverse("product-facets"), {"param[Цвет]": "красный"})
+    assert response.status_code == HTTP_200_OK
+    facets = response.json()
+    assert facets["Цвет"] == [
+        {"value": "красный", "count": len(matching(Цвет=["красный"]))}
+    ]
+    response = api_client.get(reverse("product-facets"))
+    memory = {
+        facet["value"]: facet["count"]
+        for facet in response.json()["Встроенная память (Гб)"]
+    }
+    assert memory["256"] == len(matching(**{"Встроенная память (Гб)": ["256"]}))
+    # Фасеты без фильтров группируют всю таблицу параметров, поэтому до
+    # изменения каталога повторный запрос отдается из кэша без запросов к ней
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(reverse("product-facets"))
+    assert response["X-Cache"] == "HIT"
+    assert not any("backend_productparameter" in query["sql"] for query in queries)
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_catalog_read_model(
+    api_client, shop_factory, price_list, django_capture_on_commit_callbacks
+):
+    """Тест витрины каталога: та же выдача, что у ProductInfo, и актуальность."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    url = f"{reverse('product-search')}?page_size=100"
+    with CaptureQueriesContext(connection) as queries:
+        results = api_client.get(url).json()["results"]
+    assert len([q for q in queries if q["sql"].startswith('SELECT "backend_')]) == 1
+    expected = ProductInfoSerializer(
+        ProductInfo.objects.filter(shop=shop).order_by("id"), many=True
+    ).data
+    assert results == json.loads(json.dumps(expected))
+
+    # Версии каталога меняются после фиксации транзакции
+    with django_capture_on_commit_callbacks(execute=True):
+        product_info = ProductInfo.objects.get(pk=results[0]["id"])
+        product_info.price = 1
+        product_info.save()
+        parameter = product_info.product_parameters.first()
+        parameter.value = "новое значение"
+        parameter.save()
+        category = product_info.product.category
+        category.name = "Новая категория"
+        category.save()
+    item = api_client.get(url).json()["results"][0]
+    assert item["price"] == 1
+    assert item["product"]["category"] == "Новая категория"
+    assert {"parameter": parameter.parameter.name, "value": "новое значение"} in (
+        item["product_parameters"]
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        import_price_list(shop, price_list["categories"], price_list["goods"])
+    assert api_client.get(url).json()["results"][0]["price"] == (
+        price_list["goods"][0]["price"]
+    )
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_catalog_cache_versions(
+    api_client,
+    user_factory,
+    shop_factory,
+    price_list,
+    django_capture_on_commit_callbacks,
+):
+    """Тест кэша каталога: попадания, сброс по версии при импорте и смене статуса."""
+    partner = user_factory(type="shop")
+    shop, other = shop_factory(status=True, user=partner), shop_factory(status=True)
+    url = reverse("product-search")
+
+    def fetch(**params):
+        response = api_client.get(url, params)
+        return response["X-Cache"], response.json()["results"]
+
+    def run_import(target, goods):
+        with django_capture_on_commit_callbacks(execute=True):
+            import_price_list(target, price_list["categories"], goods)
+
+    run_import(shop, price_list["goods"])
+    assert fetch()[0] == "MISS"
+    assert fetch()[0] == "HIT"
+    assert fetch(shop_id=shop.id)[0] == "MISS"
+    run_import(shop, price_list["goods"])  # Прайс не изменился
+    assert fetch()[0] == "HIT"
+    goods = copy.deepcopy(price_list["goods"])
+    goods[0]["price"] = 1
+    run_import(other, goods)
+    assert fetch(shop_id=shop.id)[0] == "HIT"
+    state, results = fetch(shop_id=other.id)
+    assert state == "MISS" and results[0]["price"] == 1
+    assert fetch()[0] == "MISS"
+
+    api_client.force_authenticate(user=partner)
+    with django_capture_on_commit_callbacks(execute=True):
+        api_client.post(reverse("partner-status"), {"status": "false"})
+    state, results = fetch(shop_id=shop.id)
+    assert state == "MISS" and results == []
+
+    api_client.force_authenticate(user=user_factory(is_staff=True))
+    response = api_client.get(reverse("catalog-cache"))
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["products"]["hits"] >= 3
+    assert 0 < response.json()["products"]["hit_rate"] < 1
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_catalog_etags(
+    api_client, shop_factory, price_list, django_capture_on_commit_callbacks
+):
+    """Тест ETag каталога: 304 без запросов к базе, пока версия не изменилась."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    for name in ("product-search", "categories", "shops"):
+        url = reverse(name)
+        response = api_client.get(url)
+        assert response.status_code == HTTP_200_OK
+        assert "no-store" not in response["Cache-Control"]
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304 and response["ETag"] == etag
+        assert not [q for q in queries if q["sql"].startswith('SELECT "backend_')]
+        response = api_client.get(url, {"page_size": 5}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTP_200_OK
+
+    url = reverse("product-search")
+    etag = api_client.get(url)["ETag"]
+    with django_capture_on_commit_callbacks(execute=True):
+        ProductInfo.objects.filter(shop=shop).update(price=1)
+        bump_catalog_version_on_commit(shop.id)
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTP_200_OK and response["ETag"] != etag
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_suggest(api_client, shop_factory, price_list, monkeypatch):
+    """Тест подсказок поиска: начало слова, опечатка, модель и порядок."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    hidden = shop_factory(status=False)
+    import_price_list(hidden, price_list["categories"], price_list["goods"][:1])
+    url = reverse("product-suggest")
+
+    def suggest(query, **params):
+        response = api_client.get(url, {"q": query, **params})
+        assert response.status_code == HTTP_200_OK
+        return response.json()
+
+    item = price_list["goods"][0]
+    name = item["name"]
+    # С pg_trgm и без него (поиск подстроки, если расширения нет в сборке)
+    for trigram in sorted({has_trigram_extension(), False}, reverse=True):
+        monkeypatch.setattr(
+            "backend.filters.has_trigram_extension", lambda trigram=trigram: trigram
+        )
+        cache.clear()
+        suggestions = suggest(name[:4])
+        assert suggestions[0]["name"].lower().startswith(name[:4].lower())
+        assert len({entry["id"] for entry in suggestions}) == len(suggestions)
+        if trigram:
+            typo = name[:2] + name[3] + name[2] + name[4:]
+            assert name in [entry["name"] for entry in suggest(typo)]
+        assert name in [entry["name"] for entry in suggest(item["model"])]
+        assert len(suggest(name[:3], limit=2)) <= 2
+        assert suggest("я") == []
+        assert api_client.get(url, {"q": name[:4]})["X-Cache"] == "HIT"
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_export_streaming(api_client, shop_factory, price_list, settings):
+    """Тест потоковой выгрузки каталога: NDJSON со сжатием и CSV пачками."""
+    settings.CATALOG_EXPORT_CHUNK_SIZE = 2
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    shop_factory(status=False)
+    expected = api_client.get(reverse("product-search"), {"page_size": 100}).json()
+    url = reverse("product-export")
+
+    response = api_client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+    assert response.status_code == HTTP_200_OK and response.streaming
+    assert response["Content-Encoding"] == "gzip"
+    lines = gzip.decompress(b"".join(response.streaming_content)).splitlines()
+    assert [json.loads(line) for line in lines] == expected["results"]
+
+    response = api_client.get(url, {"type": "csv"})
+    assert "Content-Encoding" not in response
+    chunks = list(response.streaming_content)
+    assert len(chunks) == (len(expected["results"]) + 1) // 2
+    rows = list(csv.DictReader(b"".join(chunks).decode().splitlines()))
+    assert [int(row["id"]) for row in rows] == [
+        item["id"] for item in expected["results"]
+    ]
+    first = expected["results"][0]
+    assert json.loads(rows[0]["parameters"]) == {
+        item["parameter"]: item["value"] for item in first["product_parameters"]
+    }
+    assert api_client.get(url, {"type": "xml"}).status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_products_price_filters_and_ordering(api_client, shop_factory, price_list):
+    """Тест фильтров по цене и наличию и сортировок каталога с курсором."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    url = reverse("product-search")
+
+    def fetch_all(**params):
+        results, response = [], api_client.get(url, {"page_size": 2, **params})
+        while True:
+            assert response.status_code == HTTP_200_OK
+            results += response.json()["results"]
+            if not response.json()["next"]:
+                return results
+            response = api_client.get(response.json()["next"])
+
+    goods = price_list["goods"]
+    prices = sorted(item["price"] for item in goods)
+    low, high = prices[1], prices[-2]
+    results = fetch_all(price_min=low, price_max=high, ordering="price")
+    assert [item["price"] for item in results] == [
+        price for price in prices if low <= price <= high
+    ]
+    results = fetch_all(ordering="-price_rrc")
+    assert [item["price_rrc"] for item in results] == sorted(
+        (item["price_rrc"] for item in goods), reverse=True
+    )
+    assert len(results) == len({item["id"] for item in results}) == len(goods)
+    results = fetch_all(in_stock="true", ordering="quantity")
+    assert [item["quantity"] for item in results] == sorted(
+        item["quantity"] for item in goods if item["quantity"] > 0
+    )
+    response = api_client.get(url, {"price_min": "дешево"})
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+CATALOG_QUERY_SHAPES = [
+    ("", "backend_catalogentry_pkey"),
+    ("ordering=price", "catalog_price"),
+    ("ordering=-price", "catalog_price"),
+    ("ordering=price_rrc", "catalog_price_rrc"),
+    ("ordering=-price_rrc", "catalog_price_rrc"),
+    ("ordering=quantity", "catalog_quantity"),
+    ("ordering=-quantity", "catalog_quantity"),
+    ("price_min=1000&price_max=50000&ordering=price", "catalog_price"),
+    ("in_stock=1&ordering=-quantity", "catalog_quantity"),
+    ("in_stock=1&price_max=50000", None),
+    ("shop_id={shop}&ordering=price", None),
+    ("category_id={category}&ordering=-price_rrc", None),
+]
+
+
+@pytest.mark.django_db
+def test_catalog_query_shapes_use_indexes(shop_factory, category_factory):
+    """Тест планов запросов каталога: каждая выдаваемая форма идет по индексу."""
+    shops = [shop.id for shop in shop_factory(_quantity=20, status=True)]
+    categories = [category.id for category in category_factory(_quantity=50)]
+    # Объем и статистика как у настоящего каталога, иначе на пустых таблицах
+    # планировщик выбирает полный просмотр
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO backend_product (category_id, name)
+            SELECT (%(categories)s::int[])[1 + n %% 50], 'Продукт ' || n
+            FROM generate_series(1, 20000) AS n
+            """,
+            {"categories": categories},
+        )
+        cursor.execute(
+            """
+            INSERT INTO backend_productinfo (
+                model, external_id, product_id, shop_id, quantity, price, price_rrc
+            )
+            SELECT '', id, id, (%(shops)s::int[])[1 + id %% 20], (id * 7) %% 25,
+                1000 + (id * 7919) %% 200000, 1100 + (id * 7919) %% 220000
+            FROM backend_product
+            """,
+            {"shops": shops},
+        )
+        cursor.execute("""
+            INSERT INTO backend_catalogentry (
+                product_info_id, shop_id, shop_name, category_id, category_name,
+                product_id, product_name, model, external_id, quantity, price,
+                price_rrc, parameters
+            )
+            SELECT pi.id, pi.shop_id, '', p.category_id, '', p.id, p.name, '',
+                pi.external_id, pi.quantity, pi.price, pi.price_rrc, '[]'
+            FROM backend_productinfo pi
+            JOIN backend_product p ON p.id = pi.product_id
+            """)
+        cursor.execute("ANALYZE backend_catalogentry, backend_shop")
+    for params, index in CATALOG_QUERY_SHAPES:
+        query_params = QueryDict(params.format(shop=shops[0], category=categories[0]))
+        queryset = filter_catalog(query_params)
+        queryset = queryset.order_by(*catalog_ordering(query_params, queryset))
+        plan = queryset[: settings.PRODUCTS_PAGE_SIZE + 1].explain()
+        assert "Seq Scan on backend_catalogentry" not in plan, params
+        if index:
+            assert index in plan, params
+
+
 @pytest.mark.urls("backend.urls")
 @pytest.mark.django_db
 def test_category_get(api_client, category_factory):
@@ -239,3 +744,675 @@ def test_basket_view_get_authenticated(api_client):
     response = api_client.get(url, data, format="json")
     assert response.status_code == HTTP_200_OK
     assert len(response.json()) == 0
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_basket_batch_add(api_client, user_factory, shop_factory, price_list):
+    """Тест пакетного добавления в корзину: результаты по строкам, число запросов."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    positions = list(ProductInfo.objects.filter(shop=shop).order_by("id"))
+    available = [position for position in positions if position.quantity >= 3]
+    target, other = available.pop(), available.pop()
+    empty = [position for position in positions if position.quantity == 0]
+    api_client.force_authenticate(user=user_factory(type="buyer"))
+    url = reverse("basket")
+
+    def add(lines):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(url, {"items": lines}, format="json")
+        # Запросы профилировщика silk не считаются
+        count = len([q for q in queries if "backend_" in q["sql"].split("(")[0]])
+        return response, count
+
+    add([{"product_info": available[0].id, "quantity": 1}])  # Создание корзины
+    response, few = add([{"product_info": available[0].id, "quantity": 1}])
+    assert response.status_code == HTTP_201_CREATED
+    assert response.json()["items"][0]["quantity"] == 2
+    lines = [{"product_info": position.id, "quantity": 1} for position in available]
+    response, many = add(lines)
+    assert response.status_code == HTTP_201_CREATED and len(lines) > 5
+    assert many == few
+    assert response.json()["Status"] is True
+
+    lines = [
+        {"product_info": target.id, "quantity": 1},
+        {"product_info": 0, "quantity": 1},
+        {"product_info": other.id, "quantity": other.quantity + 1},
+        {"product_info": target.id, "quantity": "1"},
+        {"product_info": target.id, "quantity": 2},
+    ] + [{"product_info": position.id, "quantity": 1} for position in empty]
+    response = add(lines)[0]
+    results = response.json()["items"]
+    assert response.status_code == HTTP_201_CREATED
+    assert response.json()["Status"] is False
+    assert [result["Status"] for result in results[:5]] == [
+        True,
+        False,
+        False,
+        False,
+        True,
+    ]
+    assert results[0]["quantity"] == results[4]["quantity"] == 3
+    assert not any(result["Status"] for result in results[5:])
+    basket = OrderItem.objects.filter(order__status="basket")
+    assert basket.count() == len(available) + 1
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_basket_bulk_update(api_client, user_factory, shop_factory, price_list):
+    """Тест пакетного изменения корзины: один UPDATE со сверкой остатков."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    positions = [
+        position
+        for position in ProductInfo.objects.filter(shop=shop).order_by("id")
+        if position.quantity >= 3
+    ]
+    absent = positions.pop()
+    api_client.force_authenticate(user=user_factory(type="buyer"))
+    url = reverse("basket")
+    lines = [{"product_info": position.id, "quantity": 1} for position in positions]
+    api_client.post(url, {"items": lines}, format="json")
+
+    def update(lines):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.put(url, {"items": lines}, format="json")
+        updates = [q for q in queries if "UPDATE backend_orderitem" in q["sql"]]
+        return response.json(), len(updates)
+
+    result, updates = update([{"id": positions[0].id, "quantity": 2}])
+    assert result["Status"] is True and updates == 1
+    result, updates = update(
+        [{"id": position.id, "quantity": 3} for position in positions]
+    )
+    assert result["Status"] is True and updates == 1
+    assert result["Создано объектов"] == len(positions)
+
+    first, second = positions[0], positions[1]
+    result, _ = update(
+        [
+            {"id": first.id, "quantity": 2},
+            {"id": absent.id, "quantity": 1},
+            {"id": second.id, "quantity": second.quantity + 1},
+            {"id": first.id, "quantity": "2"},
+            {"id": first.id, "quantity": 0},
+        ]
+    )
+    assert result["Status"] is False and result["Создано объектов"] == 1
+    assert [item["Status"] for item in result["items"]] == [
+        True,
+        False,
+        False,
+        False,
+        False,
+    ]
+    assert "нет в корзине" in result["items"][1]["Error"]
+    assert str(second.quantity) in result["items"][2]["Error"]
+    basket = dict(
+        OrderItem.objects.filter(order__status="basket").values_list(
+            "product_info_id", "quantity"
+        )
+    )
+    assert basket[first.id] == 2 and basket[second.id] == 3
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_order_totals_maintained(
+    api_client, user_factory, shop_factory, contact_factory, price_list, celery_eager
+):
+    """Тест хранимых итогов заказа: корзина, фиксация цен при оформлении."""
+    shop = shop_factory(status=True)
+    other = shop_factory(status=True, user=user_factory(type="shop"))
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    import_price_list(other, price_list["categories"], price_list["goods"][:1])
+    first, second = [
+        position
+        for position in ProductInfo.objects.filter(shop=shop).order_by("id")
+        if position.quantity >= 3
+    ][:2]
+    foreign = ProductInfo.objects.get(shop=other)
+    buyer = user_factory(type="buyer")
+    api_client.force_authenticate(user=buyer)
+    url = reverse("basket")
+
+    def basket():
+        order = Order.objects.get(user=buyer, status="basket")
+        expected = sum(
+            item.quantity * item.product_info.price
+            for item in order.ordered_items.select_related("product_info")
+        )
+        assert order.total_sum == expected
+        assert order.items_count == order.ordered_items.count()
+        return order
+
+    lines = [
+        {"product_info": first.id, "quantity": 2},
+        {"product_info": second.id, "quantity": 1},
+        {"product_info": foreign.id, "quantity": 1},
+    ]
+    api_client.post(url, {"items": lines}, format="json")
+    assert basket().items_count == 3
+    api_client.put(url, {"items": [{"id": first.id, "quantity": 3}]}, format="json")
+    order = basket()
+    item = OrderItem.objects.get(order=order, product_info=second)
+    api_client.delete(url, {"items": str(item.id)}, format="json")
+    assert basket().items_count == 2
+    assert api_client.get(url).json()[0]["total_sum"] == order.total_sum - (
+        second.price
+    )
+
+    # Цена изменилась до оформления: в заказ попадает цена на момент оформления
+    ProductInfo.objects.filter(pk=first.pk).update(price=first.price + 100)
+    response = api_client.post(
+        reverse("order"),
+        {"id": str(order.id), "contact": contact_factory(user=buyer).id},
+        format="json",
+    )
+    assert response.json()["Status"] is True
+    order.refresh_from_db()
+    assert order.total_sum == 3 * (first.price + 100) + foreign.price
+    ProductInfo.objects.filter(pk=first.pk).update(price=1)
+    with CaptureQueriesContext(connection) as queries:
+        history = api_client.get(reverse("order")).json()
+    assert history[0]["total_sum"] == order.total_sum
+    assert history[0]["items_count"] == 2
+    orders_sql = [q["sql"] for q in queries if 'FROM "backend_order"' in q["sql"]]
+    assert orders_sql and not any(
+        "SUM(" in sql or "DISTINCT" in sql for sql in orders_sql
+    )
+
+    api_client.force_authenticate(user=other.user)
+    partner = api_client.get(reverse("partner-orders")).json()
+    assert [(entry["id"], entry["total_sum"]) for entry in partner] == [
+        (order.id, foreign.price)
+    ]
+
+
+@pytest.mark.django_db
+def test_order_item_price_outside_basket(user_factory, shop_factory, price_list):
+    """Тест позиции, добавленной через ORM: цена берется из прайса, а не 0."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"][:1])
+    position = ProductInfo.objects.get(shop=shop)
+    order = Order.objects.create(user=user_factory(), status="new")
+    item = OrderItem.objects.create(order=order, product_info=position, quantity=2)
+    assert item.price == position.price
+    refresh_order_totals([order.id])
+    order.refresh_from_db()
+    assert order.total_sum == 2 * position.price
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_order_checkout_reserves_stock(
+    api_client, user_factory, shop_factory, contact_factory, price_list, celery_eager
+):
+    """Тест оформления заказа: резерв остатков или отказ без частичного списания."""
+    shop = shop_factory(status=True)
+    import_price_list(shop, price_list["categories"], price_list["goods"])
+    first, second = [
+        position
+        for position in ProductInfo.objects.filter(shop=shop).order_by("id")
+        if position.quantity >= 3
+    ][:2]
+    buyer = user_factory(type="buyer")
+    contact = contact_factory(user=buyer)
+    api_client.force_authenticate(user=buyer)
+    lines = [
+        {"product_info": first.id, "quantity": 2},
+        {"product_info": second.id, "quantity": 3},
+    ]
+    api_client.post(reverse("basket"), {"items": lines}, format="json")
+    order = Order.objects.get(user=buyer, status="basket")
+    data = {"id": str(order.id), "contact": contact.id}
+
+    # Остатка второй позиции не хватает: заказ не оформлен, ничего не списано
+    ProductInfo.objects.filter(pk=second.pk).update(quantity=2)
+    response = api_client.post(reverse("order"), data, format="json")
+    assert response.status_code == 409
+    assert response.json()["items"] == [
+        {"product_info": second.id, "quantity": 3, "available": 2}
+    ]
+    order.refresh_from_db()
+    assert order.status == "basket"
+    assert ProductInfo.objects.get(pk=first.pk).quantity == first.quantity
+
+    ProductInfo.objects.filter(pk=second.pk).update(quantity=second.quantity)
+    response = api_client.post(reverse("order"), data, format="json")
+    assert response.json()["Status"] is True
+    order.refresh_from_db()
+    assert order.status == "new" and order.contact_id == contact.id
+    assert ProductInfo.objects.get(pk=first.pk).quantity == first.quantity - 2
+    assert ProductInfo.objects.get(pk=second.pk).quantity == second.quantity - 3
+    assert CatalogEntry.objects.get(pk=second.pk).quantity == second.quantity - 3
+
+    # Повторное оформление того же заказа остаток не списывает
+    response = api_client.post(reverse("order"), data, format="json")
+    assert response.status_code == 400
+    assert ProductInfo.objects.get(pk=first.pk).quantity == first.quantity - 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_basket_single_per_user(
+    user_factory,
+    contact_factory,
+    product_info_factory,
+    product_factory,
+    category_factory,
+    shop_factory,
+):
+    """Тест корзины: одна на пользователя, устаревший id из кэша не используется."""
+    buyer = user_factory(type="buyer")
+
+    def lookup(_):
+        try:
+            return basket_id(buyer.id)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = set(executor.map(lookup, range(32)))
+    assert len(ids) == 1
+    assert Order.objects.filter(user=buyer, status="basket").count() == 1
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Order.objects.create(user=buyer, status="basket")
+
+    (order_id,) = ids
+    position = product_info_factory(
+        product=product_factory(category=category_factory()),
+        shop=shop_factory(status=True),
+        quantity=5,
+    )
+    line = {"product_info": position.id, "quantity": 1}
+    # id корзины берется из кэша: отдельного запроса к корзине нет
+    with CaptureQueriesContext(connection) as queries:
+        assert add_to_basket(buyer.id, [line])[1] == 1
+    assert not [q for q in queries if "INSERT INTO backend_order (" in q["sql"]]
+
+    # В кэше чужая или несуществующая корзина: строки пишутся в свою
+    other = basket_id(user_factory(type="buyer").id)
+    for stale in (other, 10**9):
+        cache.set(basket_cache_key(buyer.id), stale)
+        assert add_to_basket(buyer.id, [line])[1] == 1
+        assert cache.get(basket_cache_key(buyer.id)) == order_id
+    cache.set(basket_cache_key(buyer.id), other)
+    update = update_basket(buyer.id, [{"id": position.id, "quantity": 4}])
+    assert update[1] == 1
+    assert not OrderItem.objects.filter(order_id=other).exists()
+    assert OrderItem.objects.get(order_id=order_id).quantity == 4
+
+    # После оформления корзины следующий запрос получает новую
+    assert checkout(buyer.id, order_id, contact_factory(user=buyer).id) == (True, [])
+    assert basket_id(buyer.id) != order_id
+    assert Order.objects.filter(user=buyer, status="basket").count() == 1
+
+
+@pytest.mark.django_db
+def test_import_price_list_batched(shop_factory, price_list):
+    """Тест пакетного импорта прайса: число запросов не зависит от числа товаров."""
+    shop = shop_factory()
+    with CaptureQueriesContext(connection) as queries:
+        stats = import_price_list(
+            shop, price_list["categories"], price_list["goods"], batch_size=100
+        )
+    # EXPLAIN добавляет профилировщик silk, если он активен
+    assert len([q for q in queries if not q["sql"].startswith("EXPLAIN")]) <= 24
+    assert stats["goods"] == len(price_list["goods"])
+    assert stats["batches"] == 1
+    assert ProductInfo.objects.filter(shop=shop).count() == len(price_list["goods"])
+    assert ProductParameter.objects.filter(product_info__shop=shop).count() == sum(
+        len(item["parameters"]) for item in price_list["goods"]
+    )
+    stats = import_price_list(
+        shop, price_list["categories"], price_list["goods"], batch_size=5
+    )
+    assert stats["batches"] == 3
+    assert ProductInfo.objects.filter(shop=shop).count() == len(price_list["goods"])
+    assert Product.objects.count() == len(
+        {(item["name"], item["category"]) for item in price_list["goods"]}
+    )
+
+
+def test_yaml_price_list_streaming(price_list):
+    """Тест потокового разбора YAML-прайса: товары отдаются по одному."""
+    with open(settings.BASE_DIR.parent / "data" / "shop1.yaml", "rb") as stream:
+        reader = YamlPriceList(stream)
+        assert reader.shop == price_list["shop"]
+        assert reader.categories == price_list["categories"]
+        goods = reader.goods()
+        assert next(goods) == price_list["goods"][0]
+        assert [next(goods)] + list(goods) == price_list["goods"][1:]
+
+
+def test_yaml_price_list_goods_before_categories(price_list):
+    """Тест YAML-прайса, где секция goods идет раньше shop и categories."""
+    content = yaml.safe_dump(
+        {
+            "goods": price_list["goods"],
+            "shop": price_list["shop"],
+            "categories": price_list["categories"],
+        },
+        allow_unicode=True,
+        sort_keys=False,
+    ).encode()
+    reader = YamlPriceList(io.BytesIO(content))
+    assert reader.shop == price_list["shop"]
+    assert reader.categories == price_list["categories"]
+    assert list(reader.goods()) == price_list["goods"]
+
+    class Unseekable:
+        def __init__(self, data):
+            self.read = io.BytesIO(data).read
+
+    reader = YamlPriceList(Unseekable(content))
+    with pytest.raises(ValueError, match="секция shop идет после goods"):
+        list(reader.goods())
+
+
+@pytest.mark.django_db
+def test_get_import_streaming(user_factory, feed_server, price_list):
+    """Тест импорта прайса по URL с потоковым чтением ответа."""
+    partner = user_factory(type="shop")
+    result = get_import(partner.id, f"{feed_server}/shop1.yaml")
+    assert result["Status"] is True
+    assert result["Stats"]["goods"] == len(price_list["goods"])
+    assert ProductInfo.objects.filter(shop__user=partner).count() == len(
+        price_list["goods"]
+    )
+
+
+@pytest.mark.django_db
+def test_import_price_list_delta(
+    user_factory, shop_factory, order_factory, order_item_factory, price_list
+):
+    """Тест дельта-импорта: пишутся только изменения, заказы не теряются."""
+    shop = shop_factory()
+    import_price_list(shop, price_list["categories"], price_list["goods"], mode="full")
+    kept = ProductInfo.objects.get(shop=shop, external_id=price_list["goods"][0]["id"])
+    order_item = order_item_factory(
+        order=order_factory(user=user_factory()), product_info=kept, quantity=1
+    )
+    goods = copy.deepcopy(price_list["goods"])
+    goods[1]["price"] += 100
+    goods[2]["parameters"]["Цвет"] = "белый"
+    removed = goods.pop(3)
+    goods.append(dict(goods[4], id=1, model="new"))
+    stats = import_price_list(shop, price_list["categories"], goods, mode="delta")
+    assert stats["inserted"] == 1
+    assert stats["updated"] == 2
+    assert stats["deleted"] == 1
+    assert stats["unchanged"] == len(goods) - 3
+    assert ProductInfo.objects.filter(shop=shop).count() == len(goods)
+    assert not ProductInfo.objects.filter(shop=shop, external_id=removed["id"]).exists()
+    assert ProductInfo.objects.get(pk=kept.pk)
+    assert OrderItem.objects.filter(pk=order_item.pk).exists()
+    assert (
+        ProductParameter.objects.get(
+            product_info__shop=shop,
+            product_info__external_id=goods[2]["id"],
+            parameter__name="Цвет",
+        ).value
+        == "белый"
+    )
+    stats = import_price_list(shop, price_list["categories"], goods, mode="delta")
+    assert stats["unchanged"] == len(goods)
+
+
+@pytest.mark.django_db
+def test_get_import_skips_unchanged_feed(user_factory, feed_server):
+    """Тест пропуска импорта неизменившегося прайса (304 и совпадение хэша)."""
+    partner = user_factory(type="shop")
+    url = f"{feed_server}/shop1.yaml"
+    assert "Stats" in get_import(partner.id, url)
+    shop = Shop.objects.get(user=partner)
+    assert shop.feed_hash and shop.feed_last_modified
+    assert get_import(partner.id, url) == {"Status": True, "Skipped": "not_modified"}
+    Shop.objects.filter(pk=shop.pk).update(feed_last_modified="")
+    assert get_import(partner.id, url) == {"Status": True, "Skipped": "same_hash"}
+    assert list(
+        ImportSkip.objects.filter(shop=shop).values_list("reason", flat=True)
+    ) == ["same_hash", "not_modified"]
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_partner_update_enqueues_import(
+    api_client, user_factory, feed_server, celery_eager
+):
+    """Тест постановки импорта в очередь и ограниченного ожидания результата."""
+    api_client.force_authenticate(user=user_factory(type="shop"))
+    url = reverse("partner-update")
+    data = {"url": f"{feed_server}/shop1.yaml"}
+    response = api_client.post(url, data, format="json")
+    assert response.status_code == HTTP_202_ACCEPTED
+    assert response.json()["Task"]
+    response = api_client.post(url, dict(data, wait=5), format="json")
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["Skipped"] == "not_modified"
+    response = api_client.post(url, dict(data, wait="long"), format="json")
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_partner_import_job_status(
+    api_client, user_factory, feed_server, celery_eager, price_list
+):
+    """Тест получения состояния и сводки изменений задачи импорта."""
+    partner = user_factory(type="shop")
+    api_client.force_authenticate(user=partner)
+    response = api_client.post(
+        reverse("partner-update-task"),
+        {"url": f"{feed_server}/shop1.yaml"},
+        format="json",
+    )
+    assert response.status_code == HTTP_200_OK
+    job_id = response.json()["Job"]
+    response = api_client.get(reverse("partner-import", kwargs={"job_id": job_id}))
+    assert response.status_code == HTTP_200_OK
+    job = response.json()
+    assert job["state"] == "done"
+    assert job["goods_processed"] == len(price_list["goods"])
+    assert job["diff"]["inserted"] == len(price_list["goods"])
+    assert job["eta"] is None
+    response = api_client.get(reverse("partner-imports"))
+    assert [item["id"] for item in response.json()] == [job_id]
+    api_client.force_authenticate(user=user_factory(type="shop"))
+    response = api_client.get(reverse("partner-import", kwargs={"job_id": job_id}))
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_parallel_import_matches_serial(shop_factory, price_list):
+    """Тест параллельного импорта частями: результат совпадает с последовательным."""
+    shop = shop_factory()
+    import_price_list(shop, price_list["categories"], price_list["goods"], mode="full")
+    goods = copy.deepcopy(price_list["goods"])
+    goods[1]["price"] += 100
+    goods[2]["parameters"]["Цвет"] = "белый"
+    goods.pop(3)
+    goods.append(dict(goods[4], id=1, model="new"))
+    for chunk in batched(goods, 5):
+        stage_goods("test-key", chunk)
+    stats = merge_staged_goods(shop, "test-key")
+    assert (stats["inserted"], stats["updated"], stats["deleted"]) == (1, 2, 1)
+    assert stats["unchanged"] == len(goods) - 3
+    assert not ImportStagingItem.objects.exists()
+    stats = import_price_list(shop, price_list["categories"], goods, mode="delta")
+    assert stats["unchanged"] == len(goods)
+
+
+@pytest.mark.django_db
+def test_get_import_parallel(
+    user_factory, feed_server, celery_eager, settings, tmp_path, price_list
+):
+    """Тест параллельного импорта крупного прайса группой задач Celery."""
+    settings.IMPORT_PARALLEL_MIN_BYTES = 0
+    settings.IMPORT_PARALLEL_CHUNK_SIZE = 4
+    settings.IMPORT_SPOOL_DIR = tmp_path
+    partner = user_factory(type="shop")
+    job, _ = enqueue_import(partner.id, f"{feed_server}/shop1.yaml")
+    job.refresh_from_db()
+    assert job.state == "done"
+    assert job.inserted == job.goods_processed == len(price_list["goods"])
+    assert ProductInfo.objects.filter(shop__user=partner).count() == len(
+        price_list["goods"]
+    )
+    assert list(tmp_path.iterdir()) == []
+
+    # Повторный импорт в режиме full: каталог записывается заново
+    Shop.objects.filter(user=partner).update(
+        feed_hash="", feed_etag="", feed_last_modified=""
+    )
+    job, _ = enqueue_import(partner.id, f"{feed_server}/shop1.yaml", mode="full")
+    job.refresh_from_db()
+    assert job.state == "done"
+    assert job.inserted == job.deleted == len(price_list["goods"])
+
+
+@pytest.mark.django_db
+def test_get_import_parallel_chunk_failure(
+    user_factory, feed_server, celery_eager, settings, tmp_path, monkeypatch
+):
+    """Тест сбоя части параллельного импорта: промежуточные строки удаляются."""
+    settings.IMPORT_PARALLEL_MIN_BYTES = 0
+    settings.IMPORT_PARALLEL_CHUNK_SIZE = 4
+    settings.IMPORT_SPOOL_DIR = tmp_path
+
+    def stage_and_fail(import_key, goods, batch_size=None):
+        staged = stage_goods(import_key, goods, batch_size)
+        if ImportStagingItem.objects.filter(import_key=import_key).count() > 4:
+            raise ValueError("Сбой части")
+        return staged
+
+    # В eager-режиме Celery не вызывает обработчики ошибок chord: тело chord
+    # запоминается, и ошибка передается ему так же, как это делает воркер
+    bodies = []
+
+    def chord(header):
+        def apply(body):
+            bodies.append(body)
+            return celery.chord(header)(body)
+
+        return apply
+
+    monkeypatch.setattr("backend.tasks.stage_goods", stage_and_fail)
+    monkeypatch.setattr("backend.tasks.chord", chord)
+    partner = user_factory(type="shop")
+    job, _ = enqueue_import(partner.id, f"{feed_server}/shop1.yaml")
+    job.refresh_from_db()
+    assert job.state == "failed"
+    assert job.error == "Сбой части"
+    assert ImportStagingItem.objects.exists()
+    try:
+        raise ValueError("Сбой части")
+    except ValueError as error:
+        body = bodies[0]
+        body.freeze()
+        celery_eager.backend.chord_error_from_stack(body, error)
+    assert not ImportStagingItem.objects.exists()
+    assert not ProductInfo.objects.filter(shop__user=partner).exists()
+    assert list(tmp_path.iterdir()) == []
+
+    # finish() на устаревшем объекте не затирает счетчик соседних частей
+    stale = ImportJob.objects.get(pk=job.pk)
+    ImportJob.objects.filter(pk=job.pk).update(
+        goods_processed=F("goods_processed") + 10
+    )
+    stale.finish("failed", error="Сбой части")
+    assert ImportJob.objects.get(pk=job.pk).goods_processed == (
+        stale.goods_processed + 10
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("price_format", ["json", "ndjson", "csv"])
+def test_price_list_formats_equivalent(shop_factory, price_format):
+    """Тест форматов прайса: JSON, NDJSON и CSV дают тот же каталог, что YAML."""
+    header, goods = generate_price_list(50)
+    shop = shop_factory()
+    import_price_list(shop, header["categories"], goods(), mode="full")
+    with tempfile.TemporaryFile() as stream:
+        write_price_list(stream, price_format, header, goods())
+        stream.seek(0)
+        price_list = open_price_list(stream, price_format)
+        assert price_list.shop == header["shop"]
+        assert sorted(price_list.categories, key=lambda item: item["id"]) == sorted(
+            header["categories"], key=lambda item: item["id"]
+        )
+        stats = import_price_list(
+            shop, price_list.categories, price_list.goods(), mode="delta"
+        )
+    assert stats["goods"] == 50
+    assert stats["unchanged"] == 50
+
+
+@pytest.mark.django_db
+def test_benchmark_import():
+    """Тест замера импорта: первичный прогон вставляет, повторный ничего не меняет."""
+    initial, repeat = benchmark_import(200, "ndjson")
+    assert initial["goods"] == repeat["goods"] == 200
+    assert initial["inserted"] == 200
+    assert repeat["unchanged"] == 200
+    assert 0 < repeat["queries"] < initial["queries"]
+    assert initial["peak_rss_mb"] > 0
+
+
+@pytest.mark.django_db
+def test_benchmark_catalog_serializers():
+    """Тест быстрого пути каталога: тот же JSON, что у ProductInfoSerializer."""
+    result = benchmark_catalog_serializers(300, repeat=1)
+    assert result["rows"] == 300
+    assert result["identical"]
+    assert result["speedup"] > 1
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_benchmark_catalog_serializers_target():
+    """Тест цели быстрого пути: быстрее DRF не менее чем в 5 раз на 10 000 позиций."""
+    result = benchmark_catalog_serializers(10000)
+    assert result["identical"]
+    assert result["speedup"] >= 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_checkout():
+    """Тест параллельного оформления заказов: остаток не уходит в минус."""
+    result = benchmark_checkout(buyers=20, stock=50, quantity=3, workers=8)
+    assert result["succeeded"] == 16 and result["failed"] == 4
+    assert result["remaining"] == 2
+    assert result["oversold"] == 0
+    assert result["checkouts_per_sec"] > 0
+
+
+@pytest.mark.urls("backend.urls")
+@pytest.mark.django_db
+def test_partner_upload(
+    api_client, user_factory, celery_eager, settings, tmp_path, price_list
+):
+    """Тест импорта загруженного файла прайса без скачивания по URL."""
+    settings.IMPORT_SPOOL_DIR = tmp_path
+    partner = user_factory(type="shop")
+    Shop.objects.create(name=price_list["shop"], user=partner, feed_hash="old")
+    api_client.force_authenticate(user=partner)
+    with open(settings.BASE_DIR.parent / "data" / "shop1.yaml", "rb") as stream:
+        response = api_client.post(
+            reverse("partner-upload"), {"file": stream}, format="multipart"
+        )
+    assert response.status_code == HTTP_202_ACCEPTED
+    response = api_client.get(
+        reverse("partner-import", kwargs={"job_id": response.json()["Job"]})
+    )
+    job = response.json()
+    assert job["state"] == "done"
+    assert job["filename"] == "shop1.yaml"
+    assert job["diff"]["inserted"] == len(price_list["goods"])
+    assert not list((tmp_path / "uploads").iterdir())
+    assert Shop.objects.get(user=partner).feed_hash == ""
+    response = api_client.post(reverse("partner-upload"), {}, format="multipart")
+    assert response.status_code == HTTP_400_BAD_REQUEST
@@ -12,6 +12,10 @@ from .views import (
     CategoryView,
     ShopView,
     ProductInfoView,
+    ProductFacetsView,
+    ProductExportView,
+    ProductSuggestView,
+    CatalogCacheStats,
     BasketView,
     AccountDetails,
     ContactView,
@@ -24,6 +28,8 @@ from .views import (
     ShopCreate,
     ShopStatus,
     PartnerUpdateTask,
+    PartnerUpload,
+    PartnerImportJobs,
     RegisterAccountTask,
     HomeView,
     avatar_user,
@@ -78,6 +84,18 @@ urlpatterns += [
     path(
         "products", ProductInfoView.as_view(), name="product-search"
     ),  # Для поиска товаров
+    path(
+        "products/facets", ProductFacetsView.as_view(), name="product-facets"
+    ),  # Число позиций по значениям параметров для фильтров каталога
+    path(
+        "products/suggest", ProductSuggestView.as_view(), name="product-suggest"
+    ),  # Подсказки для строки поиска
+    path(
+        "products/export", ProductExportView.as_view(), name="product-export"
+    ),  # Потоковая выгрузка каталога в NDJSON или CSV
+    path(
+        "catalog/cache", CatalogCacheStats.as_view(), name="catalog-cache"
+    ),  # Статистика кэша каталога
     path(
         "categories", CategoryView.as_view(), name="categories"
     ),  # Для просмотра категорий
@@ -93,6 +111,17 @@ urlpatterns += [
     path(
         "partner/update_task", PartnerUpdateTask.as_view(), name="partner-update-task"
     ),  # Для обновления прайса поставщика
+    path(
+        "partner/upload", PartnerUpload.as_view(), name="partner-upload"
+    ),  # Для загрузки файла прайса поставщика
+    path(
+        "partner/imports", PartnerImportJobs.as_view(), name="partner-imports"
+    ),  # Список задач импорта прайса поставщика
+    path(
+        "partner/imports/<int:job_id>",
+        PartnerImportJobs.as_view(),
+        name="partner-import",
+    ),  # Состояние и прогресс задачи импорта
     path(
         "partner/status", PartnerStatus.as_view(), name="partner-status"
     ),  # Для обновления статуса поставщика
@@ -1,19 +1,21 @@
-import json
-import requests
-from ujson import loads as load_json
-from yaml import load as load_yaml, Loader
+from functools import partial
 from urllib.parse import quote
 from distutils.util import strtobool
 from ast import literal_eval
 
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.http import JsonResponse, Http404
-from django.db.models import Q, Sum, F
+from django.db.models import Exists, F, OuterRef, Subquery, Sum
 from django.db import IntegrityError
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.core.validators import URLValidator
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from django.contrib.auth import authenticate
 from django.views.generic import TemplateView
+from django.views.decorators.cache import never_cache
+from django.utils.decorators import method_decorator
 from django.shortcuts import get_object_or_404, redirect, render
 
 from rest_framework.views import APIView
@@ -21,37 +23,61 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.generics import ListAPIView, GenericAPIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework import status
 
+from .basket import (
+    add_to_basket,
+    checkout,
+    parse_basket_items,
+    remove_from_basket,
+    update_basket,
+)
+from .exports import EXPORT_FORMATS, catalog_export_response
+from .feeds import spool_upload
+from .caching import (
+    bump_catalog_version_on_commit,
+    cached_catalog_response,
+    catalog_cache_control,
+    catalog_cache_stats,
+)
+from .filters import (
+    catalog_suggestions,
+    filter_catalog,
+    integer_param,
+    parameter_facets,
+)
 from .forms import AvatarUserImageForm, AvatarProductImageForm
+from .pagination import ProductInfoCursorPagination
 from .models import (
     Shop,
     CustomUser,
     Category,
-    Product,
-    ProductInfo,
-    Parameter,
-    ProductParameter,
     Order,
     OrderItem,
     ContactInfo,
     ConfirmEmailToken,
     AvatarUser,
     AvatarProduct,
+    ImportJob,
 )
 from .serializers import (
     UserSerializer,
     CategorySerializer,
     ShopSerializer,
     ContactInfoSerializer,
-    ProductInfoSerializer,
+    CatalogEntrySerializer,
+    CATALOG_ENTRY_COLUMNS,
+    serialize_catalog_entries,
     OrderSerializer,
-    OrderItemSerializer,
+    PartnerOrderSerializer,
+    ImportJobSerializer,
 )
 
 from .tasks import (
     send_email,
-    get_import,
+    enqueue_import,
     create_thumbnail_for_avatar_user,
     create_thumbnail_for_avatar_product,
     test_rollbar,
@@ -392,10 +418,16 @@ class ContactView(APIView):
         )
 
 
+@method_decorator(catalog_cache_control, name="dispatch")
 class ShopView(ListAPIView):
     queryset = Shop.objects.filter(status=True)
     serializer_class = ShopSerializer
 
+    def list(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request, "shops", partial(super().list, request, *args, **kwargs)
+        )
+
 
 class ShopCreate(APIView):
     @staticmethod
@@ -472,6 +504,8 @@ class ShopStatus(APIView):
                 Shop.objects.filter(user_id=request.user.id).update(
                     status=literal_eval(my_status)
                 )
+                for shop in Shop.objects.filter(user_id=request.user.id).only("id"):
+                    bump_catalog_version_on_commit(shop.id)
                 return JsonResponse({"Status": True})
             except ValueError as error:
                 return JsonResponse({"Status": False, "Errors": str(error)})
@@ -482,36 +516,127 @@ class ShopStatus(APIView):
         )
 
 
-class ProductInfoView(APIView):
-    queryset = ProductInfo.objects.all()
-    serializer_class = ProductInfoSerializer
+@method_decorator(catalog_cache_control, name="dispatch")
+class ProductInfoView(ListAPIView):
+    serializer_class = CatalogEntrySerializer
+    pagination_class = ProductInfoCursorPagination
     http_method_names = [
         "get",
     ]
 
+    def get_queryset(self):
+        # Витрина каталога: одна плоская строка на позицию, без prefetch-запросов
+        return filter_catalog(self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        # Ответы кэшируются в Redis по версии каталога, см. backend/caching.py
+        return cached_catalog_response(
+            request,
+            "products",
+            partial(self.list_rows, request),
+            request.query_params.get("shop_id"),
+        )
+
+    def list_rows(self, request):
+        # Страница читается через values() и собирается без полей DRF;
+        # CatalogEntrySerializer описывает ту же схему ответа
+        queryset = self.get_queryset()
+        columns = CATALOG_ENTRY_COLUMNS
+        if "rank" in queryset.query.annotations:
+            columns += ("rank",)
+        page = self.paginate_queryset(queryset.values(*columns))
+        return self.get_paginated_response(serialize_catalog_entries(page))
+
+
+@method_decorator(catalog_cache_control, name="dispatch")
+class ProductFacetsView(APIView):
+    """
+    Значения параметров с числом позиций для текущих фильтров каталога.
+
+    Без фильтров подсчет идет по всей таблице параметров, поэтому ответы
+    кэшируются до следующего изменения каталога, как и выдача /products.
+    """
+
     @staticmethod
     def get(request: Request, *args, **kwargs):
-        query = Q(shop__status=True)
-        shop_id = request.query_params.get("shop_id")
-        category_id = request.query_params.get("category_id")
-        if shop_id:
-            query = query & Q(shop_id=shop_id)
-        if category_id:
-            query = query & Q(product__category_id=category_id)
-        queryset = (
-            ProductInfo.objects.filter(query)
-            .select_related("shop", "product__category")
-            .prefetch_related("product_parameters__parameter")
-            .distinct()
+        return cached_catalog_response(
+            request,
+            "facets",
+            lambda: Response(parameter_facets(filter_catalog(request.query_params))),
+            request.query_params.get("shop_id"),
         )
-        serializer = ProductInfoSerializer(queryset, many=True)
-        return Response(serializer.data)
 
 
+@method_decorator(catalog_cache_control, name="dispatch")
+class ProductSuggestView(APIView):
+    """
+    Подсказки для строки поиска по названию и модели с учетом опечаток.
+
+    Параметры: q (не короче двух символов) и limit. Ответы кэшируются по
+    тексту запроса до следующего изменения каталога.
+    """
+
+    @staticmethod
+    def get(request: Request, *args, **kwargs):
+        query = request.query_params.get("q", "").strip()
+        limit = min(
+            integer_param(request.query_params, "limit")
+            or settings.PRODUCTS_SUGGEST_LIMIT,
+            settings.PRODUCTS_SUGGEST_MAX_LIMIT,
+        )
+        if len(query) < 2:
+            return Response([])
+        return cached_catalog_response(
+            request,
+            "suggest",
+            lambda: Response(catalog_suggestions(query, limit)),
+        )
+
+
+@method_decorator(never_cache, name="dispatch")
+class ProductExportView(APIView):
+    """
+    Потоковая выгрузка всего активного каталога для агрегаторов.
+
+    Параметр type - ndjson (по умолчанию) или csv, фильтры те же, что у
+    /products. Ответ сжимается gzip, если клиент его принимает.
+    """
+
+    @staticmethod
+    def get(request: Request, *args, **kwargs):
+        export_format = request.query_params.get("type", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"Status": False, "Error": "Неизвестный формат выгрузки"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return catalog_export_response(
+            filter_catalog(request.query_params),
+            export_format,
+            gzip="gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""),
+        )
+
+
+class CatalogCacheStats(APIView):
+    """Попадания и промахи кэша каталога (только для администраторов)."""
+
+    permission_classes = (IsAdminUser,)
+
+    @staticmethod
+    def get(request, *args, **kwargs):
+        return Response(catalog_cache_stats())
+
+
+@method_decorator(catalog_cache_control, name="dispatch")
 class CategoryView(ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
+    def list(self, request, *args, **kwargs):
+        return cached_catalog_response(
+            request, "categories", partial(super().list, request, *args, **kwargs)
+        )
+
 
 class OrderView(APIView):
     @staticmethod
@@ -524,14 +649,7 @@ class OrderView(APIView):
                 "ordered_items__product_info__product_parameters__parameter",
             )
             .select_related("contact")
-            .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
-                )
-            )
-            .distinct()
-            .order_by("-date")
+            .order_by("-dt")
         )
         serializer = OrderSerializer(order, many=True)
         return Response(serializer.data)
@@ -541,9 +659,13 @@ class OrderView(APIView):
         if {"id", "contact"}.issubset(request.data):
             if request.data["id"].isdigit():
                 try:
-                    is_updated = Order.objects.filter(
-                        user_id=request.user.id, id=request.data["id"]
-                    ).update(contact_id=request.data["contact"], status="new")
+                    # Резерв остатков, фиксация цен и смена статуса в одной
+                    # транзакции, см. backend/basket.py
+                    result = checkout(
+                        request.user.id,
+                        int(request.data["id"]),
+                        request.data["contact"],
+                    )
                 except IntegrityError as error:
                     return JsonResponse(
                         {
@@ -552,12 +674,21 @@ class OrderView(APIView):
                         },
                         status=status.HTTP_400_BAD_REQUEST,
                     )
-                else:
-                    if is_updated:
-                        subject = "Обновление статуса заказа"
-                        message = "Заказ сформирован"
-                        send_email.delay(subject, message, request.user.email)
-                        return JsonResponse({"Status": True}, status=status.HTTP_200_OK)
+                if result is not None:
+                    is_reserved, shortage = result
+                    if not is_reserved:
+                        return JsonResponse(
+                            {
+                                "Status": False,
+                                "Errors": "Недостаточно товара на складе",
+                                "items": shortage,
+                            },
+                            status=status.HTTP_409_CONFLICT,
+                        )
+                    subject = "Обновление статуса заказа"
+                    message = "Заказ сформирован"
+                    send_email.delay(subject, message, request.user.email)
+                    return JsonResponse({"Status": True}, status=status.HTTP_200_OK)
         return JsonResponse(
             {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
             status=status.HTTP_400_BAD_REQUEST,
@@ -567,53 +698,38 @@ class OrderView(APIView):
 class BasketView(APIView):
     @staticmethod
     def get(request, *args, **kwargs):
-        basket = (
-            Order.objects.filter(user_id=request.user.id, status="basket")
-            .prefetch_related(
-                "ordered_items__product_info__product_parameters__parameter"
-            )
-            .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
-                )
-            )
-            .distinct()
-        )
+        basket = Order.objects.filter(
+            user_id=request.user.id, status="basket"
+        ).prefetch_related("ordered_items__product_info__product_parameters__parameter")
         serializer = OrderSerializer(basket, many=True)
         return Response(serializer.data)
 
     @staticmethod
     def post(request, *args, **kwargs):
+        # Пакетное добавление: проверка и запись всех строк за фиксированное
+        # число запросов, результат по каждой строке, см. backend/basket.py
         items = request.data.get("items")
         if items:
             try:
-                items_dict = json.dumps(items)
+                items_list = parse_basket_items(items)
             except ValueError as e:
-                JsonResponse(
-                    {"Status": False, "Errors": f"Недопустимый формат запроса {e}"}
-                )
-            else:
-                basket, _ = Order.objects.get_or_create(
-                    user_id=request.user.id, status="basket"
-                )
-                objects_created = 0
-                for order_item in load_json(items_dict):
-                    order_item.update({"order": basket.id})
-                    serializer = OrderItemSerializer(data=order_item)
-                    if serializer.is_valid(raise_exception=True):
-                        try:
-                            serializer.save()
-                        except IntegrityError as e:
-                            return JsonResponse({"Status": False, "Errors": str(e)})
-                        else:
-                            objects_created += 1
-                    else:
-                        JsonResponse({"Status": False, "Errors": serializer.errors})
                 return JsonResponse(
-                    {"Status": True, "Создано объектов": objects_created},
-                    status=status.HTTP_201_CREATED,
+                    {"Status": False, "Errors": f"Недопустимый формат запроса {e}"},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
+            results, objects_created = add_to_basket(request.user.id, items_list)
+            return JsonResponse(
+                {
+                    "Status": all(result["Status"] for result in results),
+                    "Создано объектов": objects_created,
+                    "items": results,
+                },
+                status=(
+                    status.HTTP_201_CREATED
+                    if objects_created
+                    else status.HTTP_400_BAD_REQUEST
+                ),
+            )
         return JsonResponse(
             {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
             status=status.HTTP_400_BAD_REQUEST,
@@ -621,29 +737,25 @@ class BasketView(APIView):
 
     @staticmethod
     def put(request, *args, **kwargs):
-        items_sting = request.data.get("items")
-        if items_sting:
+        # Все изменения количества - одним UPDATE со сверкой остатков,
+        # результат по каждой строке, см. backend/basket.py
+        items = request.data.get("items")
+        if items:
             try:
-                items_dict = json.dumps(items_sting)
+                items_list = parse_basket_items(items)
             except ValueError as e:
-                JsonResponse(
-                    {"Status": False, "Errors": f"Недопустимый формат запроса {e}"}
-                )
-            else:
-                basket, _ = Order.objects.get_or_create(
-                    user_id=request.user.id, status="basket"
-                )
-                objects_updated = 0
-                for order_item in json.loads(items_dict):
-                    if isinstance(order_item["id"], int) and isinstance(
-                        order_item["quantity"], int
-                    ):
-                        objects_updated += OrderItem.objects.filter(
-                            order_id=basket.id, product_info_id=order_item["id"]
-                        ).update(quantity=order_item["quantity"])
                 return JsonResponse(
-                    {"Status": True, "Создано объектов": objects_updated}
+                    {"Status": False, "Errors": f"Недопустимый формат запроса {e}"},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
+            results, objects_updated = update_basket(request.user.id, items_list)
+            return JsonResponse(
+                {
+                    "Status": all(result["Status"] for result in results),
+                    "Создано объектов": objects_updated,
+                    "items": results,
+                }
+            )
         return JsonResponse(
             {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
             status=status.HTTP_400_BAD_REQUEST,
@@ -653,18 +765,13 @@ class BasketView(APIView):
     def delete(request, *args, **kwargs):
         items = request.data.get("items")
         if items:
-            items_list = items.split(",")
-            basket, _ = Order.objects.get_or_create(
-                user_id=request.user.id, status="basket"
-            )
-            query = Q()
-            objects_deleted = False
-            for order_item_id in items_list:
-                if order_item_id.isdigit():
-                    query = query | Q(order_id=basket.id, id=order_item_id)
-                    objects_deleted = True
-            if objects_deleted:
-                deleted_count = OrderItem.objects.filter(query).delete()[0]
+            item_ids = [
+                int(order_item_id)
+                for order_item_id in items.split(",")
+                if order_item_id.isdigit()
+            ]
+            if item_ids:
+                deleted_count = remove_from_basket(request.user.id, item_ids)
                 return JsonResponse(
                     {"Status": True, "Удалено объектов": deleted_count},
                     status=status.HTTP_200_OK,
@@ -695,40 +802,39 @@ class PartnerUpdate(APIView):
                 validate_url(url)
             except ValidationError as e:
                 return JsonResponse({"Status": False, "Error": str(e)})
-            else:
-                stream = requests.get(url)
-                data = load_yaml(stream.content, Loader=Loader)
-                shop, _ = Shop.objects.get_or_create(
-                    name=data["shop"], user_id=request.user.id
+            try:
+                wait = min(
+                    float(request.data.get("wait", 0)),
+                    settings.PARTNER_UPDATE_MAX_WAIT,
                 )
-                for category in data["categories"]:
-                    category_object, _ = Category.objects.get_or_create(
-                        id=category["id"], name=category["name"]
-                    )
-                    category_object.shops.add(shop.id)
-                    category_object.save()
-                ProductInfo.objects.filter(shop_id=shop.id).delete()
-                for item in data["goods"]:
-                    product, _ = Product.objects.get_or_create(
-                        name=item["name"], category_id=item["category"]
-                    )
-                    product_info = ProductInfo.objects.create(
-                        product_id=product.id,
-                        external_id=item["id"],
-                        model=item["model"],
-                        price=item["price"],
-                        price_rrc=item["price_rrc"],
-                        quantity=item["quantity"],
-                        shop_id=shop.id,
-                    )
-                    for name, value in item["parameters"].items():
-                        parameter_object, _ = Parameter.objects.get_or_create(name=name)
-                        ProductParameter.objects.create(
-                            product_info_id=product_info.id,
-                            parameter_id=parameter_object.id,
-                            value=value,
+            except (TypeError, ValueError):
+                return JsonResponse(
+                    {"Status": False, "Error": "Недопустимое значение wait"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            job, task = enqueue_import(request.user.id, url)
+            if wait > 0:
+                # Небольшие прайсы успевают импортироваться за время ожидания
+                try:
+                    result = task.get(timeout=wait, propagate=False)
+                except CeleryTimeoutError:
+                    pass
+                else:
+                    if task.failed():
+                        return JsonResponse(
+                            {
+                                "Status": False,
+                                "Error": str(result),
+                                "Task": task.id,
+                                "Job": job.id,
+                            },
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
                         )
-                return JsonResponse({"Status": True})
+                    return JsonResponse({**result, "Task": task.id, "Job": job.id})
+            return JsonResponse(
+                {"Status": True, "Task": task.id, "Job": job.id},
+                status=status.HTTP_202_ACCEPTED,
+            )
         return JsonResponse(
             {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
             status=status.HTTP_400_BAD_REQUEST,
@@ -751,18 +857,84 @@ class PartnerUpdateTask(APIView):
         url = request.data.get("url")
         if url:
             try:
-                _task = get_import.delay(request.user.id, url)
+                job, task = enqueue_import(request.user.id, url)
             except IntegrityError as e:
                 return JsonResponse(
                     {"Status": False, "Errors": f"Ошибка целостности: {e}"}
                 )
-            return JsonResponse({"Status": True}, status=status.HTTP_200_OK)
+            return JsonResponse(
+                {"Status": True, "Task": task.id, "Job": job.id},
+                status=status.HTTP_200_OK,
+            )
         return JsonResponse(
             {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
 
+class PartnerUpload(APIView):
+    """
+    Загрузка файла прайса (поле file) без размещения его по URL.
+
+    Файл пишется на диск потоково, в задачу импорта передается только путь.
+    """
+
+    parser_classes = (MultiPartParser,)
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Загрузка всегда пишется во временный файл, а не в память
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    @staticmethod
+    def post(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"Status": False, "Error": "Требуется войти в систему"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        if request.user.type != "shop":
+            return JsonResponse(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        upload = request.FILES.get("file")
+        if upload:
+            path = spool_upload(upload)
+            job, task = enqueue_import(request.user.id, filename=upload.name, path=path)
+            return JsonResponse(
+                {"Status": True, "Task": task.id, "Job": job.id},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        return JsonResponse(
+            {"Status": False, "Errors": "Не указаны все необходимые аргументы"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+@method_decorator(never_cache, name="dispatch")
+class PartnerImportJobs(APIView):
+    @staticmethod
+    def get(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {"Status": False, "Error": "Требуется войти в систему"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        if request.user.type != "shop":
+            return JsonResponse(
+                {"Status": False, "Error": "Только для магазинов"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        jobs = ImportJob.objects.filter(user_id=request.user.id)
+        job_id = kwargs.get("job_id")
+        if job_id is not None:
+            job = get_object_or_404(jobs, pk=job_id)
+            return Response(ImportJobSerializer(job.load_progress()).data)
+        jobs = [job.load_progress() for job in jobs[: settings.IMPORT_JOBS_LIST_SIZE]]
+        return Response(ImportJobSerializer(jobs, many=True).data)
+
+
 class PartnerStatus(APIView):
     @staticmethod
     def get(request, *args, **kwargs):
@@ -799,6 +971,8 @@ class PartnerStatus(APIView):
                 Shop.objects.filter(user_id=request.user.id).update(
                     status=strtobool(my_status)
                 )
+                for shop in Shop.objects.filter(user_id=request.user.id).only("id"):
+                    bump_catalog_version_on_commit(shop.id)
                 return JsonResponse({"Status": True}, status=status.HTTP_200_OK)
             except ValueError as error:
                 return JsonResponse({"Status": False, "Errors": str(error)})
@@ -821,10 +995,12 @@ class PartnerOrders(APIView):
                 {"Status": False, "Error": "Только для магазинов"},
                 status=status.HTTP_403_FORBIDDEN,
             )
+        # Сумма - только по позициям магазина партнера, по зафиксированным ценам
+        shop_items = OrderItem.objects.filter(
+            order_id=OuterRef("pk"), shop__user_id=request.user.id
+        )
         order = (
-            Order.objects.filter(
-                ordered_items__product_info__shop__user_id=request.user.id
-            )
+            Order.objects.filter(Exists(shop_items))
             .exclude(status="basket")
             .prefetch_related(
                 "ordered_items__product_info__product__category",
@@ -832,14 +1008,14 @@ class PartnerOrders(APIView):
             )
             .select_related("contact")
             .annotate(
-                total_sum=Sum(
-                    F("ordered_items__quantity")
-                    * F("ordered_items__product_info__price")
+                shop_total=Subquery(
+                    shop_items.values("order_id")
+                    .annotate(total=Sum(F("quantity") * F("price")))
+                    .values("total")
                 )
             )
-            .distinct()
         )
-        serializer = OrderSerializer(order, many=True)
+        serializer = PartnerOrderSerializer(order, many=True)
         send_email.delay(
             "Обновление статуса заказа", "Заказ обработан", request.user.email
         )
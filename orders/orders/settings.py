@@ -58,6 +58,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",  # Триграммные lookups для подсказок поиска
     "drf_spectacular",
     "backend",  # Добавлено приложение
     "rest_framework",
@@ -226,6 +227,23 @@ REST_FRAMEWORK = {
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
 }
 
+# Каталог товаров (/api/v1/products): размер страницы курсорной пагинации
+PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", 40))
+PRODUCTS_MAX_PAGE_SIZE = int(os.getenv("PRODUCTS_MAX_PAGE_SIZE", 500))
+# Время жизни ответов каталога в Redis; актуальность обеспечивают версии
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 15 * 60))
+# Конфигурация полнотекстового поиска PostgreSQL для параметра q
+PRODUCTS_SEARCH_CONFIG = os.getenv("PRODUCTS_SEARCH_CONFIG", "russian")
+# Подсказки поиска (/api/v1/products/suggest): число подсказок по умолчанию и
+# максимум, порог сходства слов pg_trgm (0..1) для опечаток
+PRODUCTS_SUGGEST_LIMIT = int(os.getenv("PRODUCTS_SUGGEST_LIMIT", 10))
+PRODUCTS_SUGGEST_MAX_LIMIT = int(os.getenv("PRODUCTS_SUGGEST_MAX_LIMIT", 50))
+PRODUCTS_SUGGEST_SIMILARITY = float(os.getenv("PRODUCTS_SUGGEST_SIMILARITY", 0.3))
+# Потоковая выгрузка каталога (/api/v1/products/export): строк на пачку курсора
+CATALOG_EXPORT_CHUNK_SIZE = int(os.getenv("CATALOG_EXPORT_CHUNK_SIZE", 2000))
+# Время жизни id корзины пользователя в Redis (см. backend/basket.py, basket_id)
+BASKET_ID_CACHE_TIMEOUT = int(os.getenv("BASKET_ID_CACHE_TIMEOUT", 60 * 60))
+
 AUTHENTICATION_BACKENDS = (
     # 'social_core.backends.google.GoogleOAuth2',  # Для Google
     # 'social_core.backends.facebook.FacebookOAuth2',  # Для Facebook (если нужно)
@@ -273,6 +291,23 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "Europe/Moscow"
 CELERY_IMPORTS = ("orders.celery",)
 
+# Импорт прайсов поставщиков
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+IMPORT_MODE = os.getenv("IMPORT_MODE", "delta")  # "delta" или "full"
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 64 * 1024))
+IMPORT_FETCH_TIMEOUT = (
+    float(os.getenv("IMPORT_CONNECT_TIMEOUT", 10)),
+    float(os.getenv("IMPORT_READ_TIMEOUT", 60)),
+)  # Таймауты соединения и чтения при загрузке прайса
+PARTNER_UPDATE_MAX_WAIT = float(os.getenv("PARTNER_UPDATE_MAX_WAIT", 30))
+IMPORT_JOBS_LIST_SIZE = 20
+# Прайсы от этого размера делятся на части и импортируются параллельно
+IMPORT_PARALLEL_MIN_BYTES = int(os.getenv("IMPORT_PARALLEL_MIN_BYTES", 50 * 1024**2))
+IMPORT_PARALLEL_CHUNK_SIZE = int(os.getenv("IMPORT_PARALLEL_CHUNK_SIZE", 20000))
+# Загруженные прайсы и части параллельного импорта. Не под MEDIA_ROOT: media
+# раздается nginx публично, а прайсы партнеров должны оставаться закрытыми
+IMPORT_SPOOL_DIR = Path(os.getenv("IMPORT_SPOOL_DIR", BASE_DIR / "spool"))
+
 # Email verification settings
 ACCOUNT_EMAIL_VERIFICATION = "none"
 ACCOUNT_LOGOUT_REDIRECT_URL = "/accounts/login/"